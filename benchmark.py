@@ -0,0 +1,338 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+import tts_extract_json as tts
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # Optional, /proc is read instead where it exists
+    psutil = None
+
+
+# Size of the synthetic deck sheets, in cards, and of each card in pixels
+SHEET_COLUMNS = 10
+SHEET_ROWS = 7
+SYNTHETIC_CARD_SIZE = (409, 585)
+SYNTHETIC_BACK_URL = "https://example.invalid/synthetic/back.jpg"
+
+# Seconds between two samples of the memory used during a stage
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def parse_list(value, item_type=str):
+    return [item_type(item) for item in value.split(",") if item]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the SCED to PDF stages on synthetic TTS saves. "
+        "No network access is needed."
+    )
+    parser.add_argument(
+        "--deck-sizes",
+        type=lambda value: parse_list(value, int),
+        default=[30, 120],
+        help="comma separated numbers of cards per synthetic deck",
+    )
+    parser.add_argument(
+        "--dpis",
+        type=lambda value: parse_list(value, int),
+        default=[150, 300],
+        help="comma separated dpi values",
+    )
+    parser.add_argument(
+        "--sharpen",
+        type=parse_list,
+        default=["off"],
+        help="comma separated sharpen settings to run, 'off' and/or 'on' "
+        "('on' needs Tesseract)",
+    )
+    parser.add_argument("--back", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--copies", type=int, default=2, help="copies of each card")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the temporary folder for inspection"
+    )
+    return parser.parse_args()
+
+
+def synthetic_sheet_url(sheet_number):
+    return f"https://example.invalid/synthetic/sheet{sheet_number}.jpg"
+
+
+def write_synthetic_sheet(path, rng, columns, rows, card_size):
+    sheet = Image.new("RGB", (columns * card_size[0], rows * card_size[1]), "white")
+    draw = ImageDraw.Draw(sheet)
+    for index in range(columns * rows):
+        left = (index % columns) * card_size[0]
+        top = (index // columns) * card_size[1]
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle(
+            [left + 8, top + 8, left + card_size[0] - 8, top + card_size[1] - 8],
+            fill=color,
+        )
+        # Give the OCR something that looks like text
+        for line in range(6):
+            draw.text(
+                (left + 30, top + card_size[1] // 2 + line * 16),
+                f"Synthetic card {index} line {line}",
+                fill="black",
+            )
+    sheet.save(path, "JPEG", quality=90)
+
+
+def generate_synthetic_deck(folder, cache_folder, deck_size, copies, rng):
+    # Sheets go into the cache folder under the names extract_sced_card looks
+    # for, so nothing is ever downloaded
+    cards_per_sheet = SHEET_COLUMNS * SHEET_ROWS
+    sheet_count = (deck_size + cards_per_sheet - 1) // cards_per_sheet
+    for sheet_number in range(sheet_count):
+        path = os.path.join(
+            cache_folder, tts.format_url(synthetic_sheet_url(sheet_number)) + ".jpg"
+        )
+        if not os.path.exists(path):
+            write_synthetic_sheet(
+                path, rng, SHEET_COLUMNS, SHEET_ROWS, SYNTHETIC_CARD_SIZE
+            )
+    back_path = os.path.join(cache_folder, tts.format_url(SYNTHETIC_BACK_URL) + ".jpg")
+    if not os.path.exists(back_path):
+        write_synthetic_sheet(back_path, rng, 1, 1, SYNTHETIC_CARD_SIZE)
+
+    objects = []
+    for card_number in range(deck_size):
+        sheet_number, card_index = divmod(card_number, cards_per_sheet)
+        deck_id = sheet_number + 1
+        card = {
+            "Name": "Card",
+            "Nickname": f"Synthetic {card_number}",
+            "CardID": deck_id * 100 + card_index,
+            "GMNotes": json.dumps({"id": f"9{card_number:05d}"}),
+            "CustomDeck": {
+                str(deck_id): {
+                    "FaceURL": synthetic_sheet_url(sheet_number),
+                    "BackURL": SYNTHETIC_BACK_URL,
+                    "NumWidth": SHEET_COLUMNS,
+                    "NumHeight": SHEET_ROWS,
+                    "BackIsHidden": True,
+                    "UniqueBack": False,
+                }
+            },
+        }
+        objects.extend([card] * copies)
+
+    save_path = os.path.join(folder, f"synthetic_{deck_size}.json")
+    with open(save_path, "w") as f:
+        json.dump({"ObjectStates": [{"Name": "Deck", "ContainedObjects": objects}]}, f)
+    return save_path
+
+
+def build_args(save_path, cache_folder, output_path, dpi, sharpen, back, workers):
+    args = tts.build_arg_parser().parse_args([])
+    args.filepath = save_path
+    args.cachepath = cache_folder
+    args.output = output_path
+    args.card_quantity_source = "tts_saved_object"
+    args.dpi = dpi
+    args.sharpen_text = sharpen
+    args.back = back
+    args.workers = workers
+    args.verbose = False
+
+    # Measure the work itself rather than reuse from earlier runs
+    args.tile_cache = False
+    args.incremental = False
+    return args
+
+
+def peak_rss_bytes():
+    # The peak of the whole process, which only runs a single configuration
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RssSampler:
+    # Samples the resident memory of the process on a thread while a stage runs.
+    # This includes the pixel buffers of Pillow, which tracemalloc can't see.
+    # Without a way to read the current RSS, the peak of the process so far is
+    # used instead.
+    def __init__(self):
+        self.start_bytes = current_rss_bytes()
+        self.peak_bytes = self.start_bytes
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start_bytes is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+
+    def stop(self):
+        if self._thread is None:
+            return {"rss_before_bytes": None, "peak_rss_bytes": peak_rss_bytes()}
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+        return {"rss_before_bytes": self.start_bytes, "peak_rss_bytes": self.peak_bytes}
+
+
+def measure(stages, name, function, *args):
+    sampler = RssSampler()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    stages[name] = {"seconds": round(seconds, 4), **sampler.stop()}
+    return result
+
+
+def run_build_dict(save_path):
+    result = {}
+    with open(save_path, "r") as f:
+        tts.build_dict(json.load(f), result)
+    return result
+
+
+def run_extract_sced_card(result, cache_folder):
+    # Cut every face from its sheet the way extract_images does
+    sheet_cache = tts.SheetCache()
+    for each in result.values():
+        deck = next(iter(each["CustomDeck"].values()))
+        tts.extract_sced_card(
+            deck["FaceURL"],
+            int(str(each["CardID"])[-2:]),
+            int(deck["NumWidth"]),
+            int(deck["NumHeight"]),
+            True,
+            cache_folder,
+            sheet_cache,
+        )
+
+
+def run_benchmark(folder, cache_folder, save_path, deck_size, dpi, sharpen, options):
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    output_path = os.path.join(folder, f"synthetic_{deck_size}_{dpi}.pdf")
+    args = build_args(
+        save_path,
+        cache_folder,
+        output_path,
+        dpi,
+        sharpen,
+        options.back,
+        options.workers,
+    )
+
+    stages = {}
+    result = measure(stages, "build_dict", run_build_dict, save_path)
+    measure(stages, "extract_sced_card", run_extract_sced_card, result, cache_folder)
+    images = measure(stages, "extract_images", tts.extract_images, args)
+    measure(stages, "arrange_images", tts.arrange_images, images, args)
+
+    return {
+        "deck_size": deck_size,
+        "copies": options.copies,
+        "placements": len(images),
+        "dpi": dpi,
+        "sharpen_text": sharpen,
+        "back": options.back,
+        "workers": options.workers,
+        "stages": stages,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "pdf_bytes": os.path.getsize(output_path),
+    }
+
+
+def main():
+    options = parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    rng = random.Random(options.seed)
+
+    folder = tempfile.mkdtemp(prefix="sced_benchmark_")
+    cache_folder = os.path.join(folder, "cache")
+    os.makedirs(cache_folder)
+
+    # Each configuration runs in a fresh process, so that its peak RSS is not
+    # the peak of an earlier, larger run
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    try:
+        for deck_size in options.deck_sizes:
+            save_path = generate_synthetic_deck(
+                folder, cache_folder, deck_size, options.copies, rng
+            )
+            for dpi in options.dpis:
+                for sharpen in options.sharpen:
+                    with context.Pool(1) as pool:
+                        run = pool.apply(
+                            run_benchmark,
+                            (
+                                folder,
+                                cache_folder,
+                                save_path,
+                                deck_size,
+                                dpi,
+                                sharpen == "on",
+                                options,
+                            ),
+                        )
+                    runs.append(run)
+                    stage_times = ", ".join(
+                        f"{name} {stage['seconds']:.2f}s"
+                        for name, stage in run["stages"].items()
+                    )
+                    print(
+                        f"{deck_size} cards, {dpi} dpi, sharpen {sharpen}: "
+                        f"{stage_times}, PDF {run['pdf_bytes'] // 1024} KB"
+                    )
+    finally:
+        if options.keep:
+            print(f"Kept benchmark files in {folder}")
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {options.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+
+@pytest.mark.parametrize("mode", ["rebuild", "verify"])
+def test_missing_cache_folder(tmp_path, monkeypatch, capsys, mode):
+    missing = str(tmp_path / "nonexist")
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["tts_extract_json.py", "--cachepath", missing, "--cache-maintenance", mode],
+    )
+
+    with pytest.raises(SystemExit) as exit_info:
+        tts.main()
+    assert exit_info.value.code == 2
+    assert f"the cache folder {missing} does not exist" in capsys.readouterr().err
+    assert not os.path.exists(missing)
@@ -0,0 +1,57 @@
+import hashlib
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+FACE_URL = "https://example.invalid/faces.png"
+MIRROR_URL = "https://mirror.invalid/player-back.jpg"
+
+
+def cache_sheet(cache_folder, url, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 56), color).save(buffer, "PNG")
+    path = os.path.join(cache_folder, tts.format_url(url) + ".png")
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+def test_player_back_under_another_url(tmp_path, monkeypatch):
+    # Neither of the common player back urls is in the cache, only a copy of
+    # the back under another url
+    cache_folder = str(tmp_path)
+    cache_sheet(cache_folder, FACE_URL, "red")
+    digest = cache_sheet(cache_folder, MIRROR_URL, "blue")
+    monkeypatch.setattr(tts, "COMMON_PLAYER_BACK_SHA256S", {digest})
+    cache_index = tts.CacheIndex(str(tmp_path / "index.json"), cache_folder)
+
+    args = tts.build_arg_parser().parse_args(
+        [
+            "save.json",
+            "--cachepath",
+            cache_folder,
+            "--card-quantity-source",
+            "tts_saved_object",
+            "--back",
+            "--exclude-player-card-backs",
+        ]
+    )
+    deck = {"FaceURL": FACE_URL, "BackURL": MIRROR_URL, "NumWidth": 1}
+    deck.update(NumHeight=1, UniqueBack=False)
+    result = {
+        "00001": {
+            "Nickname": "Card",
+            "CardID": 100,
+            "GMNotes": "",
+            "CustomDeck": {"1": deck},
+            "quantity": 1,
+        }
+    }
+
+    cards = tts.resolve_cards(args, result, cache_index=cache_index)
+    assert list(cards) == ["Card_0"]
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+
+def parse_args(tmp_path, *extra):
+    return tts.build_arg_parser().parse_args(
+        [
+            str(tmp_path / "save.json"),
+            "--cachepath",
+            str(tmp_path),
+            "--card-quantity-source",
+            "tts_saved_object",
+            "--no-tile-cache",
+            "--output",
+            str(tmp_path / "out.pdf"),
+            "--output-dir",
+            str(tmp_path / "jobs"),
+            *extra,
+        ]
+    )
+
+
+@pytest.mark.parametrize("pipeline", ["--pipeline", "--no-pipeline"])
+def test_save_without_cards(tmp_path, pipeline):
+    (tmp_path / "save.json").write_text('{"SaveName": "Empty", "ObjectStates": []}')
+    args = parse_args(tmp_path, pipeline)
+    args.filepath = args.filepaths[0]
+
+    with pytest.raises(ValueError, match="no cards found in"):
+        tts.render_deck(args)
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_job_without_cards(tmp_path):
+    jobs = tts.RenderJobs(parse_args(tmp_path), tts.SheetCache(1))
+    job = jobs.submit({"save": {"ObjectStates": []}})
+    jobs.executor.shutdown(wait=True)
+
+    job = jobs.get(job["id"])
+    assert job["status"] == "failed"
+    assert job["error"].startswith("no cards found in")
+
+
+def test_job_cant_run_cache_maintenance(tmp_path):
+    jobs = tts.RenderJobs(parse_args(tmp_path), tts.SheetCache(1))
+    with pytest.raises(ValueError, match="cache_maintenance"):
+        jobs.submit({"save": {}, "options": {"cache_maintenance": "rebuild"}})
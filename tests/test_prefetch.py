@@ -0,0 +1,128 @@
+import io
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+
+def png_bytes(color, size=(40, 56)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class SheetServer:
+    # Serves PNG sheets from a dictionary of paths and counts the requests.
+    # A path listed in fail_first answers 503 that many times before the sheet,
+    # and a path that is not in the dictionary answers 404.
+    def __init__(self):
+        self.sheets = {}
+        self.fail_first = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests[self.path] = server.requests.get(self.path, 0) + 1
+                    failing = server.fail_first.get(self.path, 0) > 0
+                    if failing:
+                        server.fail_first[self.path] -= 1
+                data = server.sheets.get(self.path)
+                if failing or data is None:
+                    self.send_response(503 if failing else 404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = SheetServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retry right away so the tests don't wait for the backoff
+    monkeypatch.setattr(tts, "DOWNLOAD_BACKOFF_FACTOR", 0)
+
+
+def cache_files(cache_folder):
+    return sorted(os.listdir(cache_folder))
+
+
+def test_prefetch_writes_each_sheet_once(server, tmp_path):
+    server.sheets = {f"/sheet{n}.png": png_bytes((n * 40, 0, 0)) for n in range(4)}
+    urls = [server.url(path) for path in server.sheets]
+
+    # Repeated urls and a second prefetch don't download anything again
+    tts.prefetch_sheets(urls + urls[:2], str(tmp_path), workers=3)
+    tts.prefetch_sheets(urls, str(tmp_path), workers=3)
+
+    assert server.requests == {path: 1 for path in server.sheets}
+    assert cache_files(tmp_path) == sorted(tts.format_url(url) + ".png" for url in urls)
+    for url, data in zip(urls, server.sheets.values()):
+        with open(os.path.join(tmp_path, tts.format_url(url) + ".png"), "rb") as f:
+            assert f.read() == data
+
+
+def test_prefetch_leaves_no_temporary_files(server, tmp_path):
+    server.sheets = {"/good.png": png_bytes("blue")}
+    tts.prefetch_sheets(
+        [server.url("/good.png"), server.url("/missing.png")], str(tmp_path)
+    )
+
+    assert not [name for name in cache_files(tmp_path) if name.endswith(".tmp")]
+    assert cache_files(tmp_path) == [tts.format_url(server.url("/good.png")) + ".png"]
+
+
+def test_prefetch_retries_unavailable_sheets(server, tmp_path):
+    server.sheets = {"/busy.png": png_bytes("green")}
+    server.fail_first = {"/busy.png": 2}
+    tts.prefetch_sheets([server.url("/busy.png")], str(tmp_path))
+
+    assert server.requests["/busy.png"] == 3
+    assert cache_files(tmp_path) == [tts.format_url(server.url("/busy.png")) + ".png"]
+
+
+def test_failed_prefetch_falls_back_to_the_card_fetch(server, tmp_path):
+    # The sheet is missing while prefetching and available once the card is cut
+    url = server.url("/late.png")
+    tts.prefetch_sheets([url], str(tmp_path))
+    assert cache_files(tmp_path) == []
+
+    server.sheets = {"/late.png": png_bytes("red", (80, 112))}
+    card = tts.extract_sced_card(url, 3, 2, 2, True, str(tmp_path))
+
+    assert card.size == (40, 56)
+    assert card.convert("RGB").getpixel((0, 0)) == (255, 0, 0)
+    assert server.requests["/late.png"] == 2
+    assert cache_files(tmp_path) == [tts.format_url(url) + ".png"]
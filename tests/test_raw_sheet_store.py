@@ -0,0 +1,44 @@
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+SHEET_SIZE = (100, 100)
+SHEET_BYTES = SHEET_SIZE[0] * SHEET_SIZE[1] * 3
+
+
+def write_sheets(cache_folder, count):
+    urls = [f"https://example.invalid/sheets/{n}.png" for n in range(count)]
+    for n, url in enumerate(urls):
+        path = os.path.join(cache_folder, tts.format_url(url) + ".png")
+        Image.new("RGB", SHEET_SIZE, (n * 20, 0, 0)).save(path)
+    return urls
+
+
+def store_size(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+
+def test_store_shared_between_jobs_stays_within_budget(tmp_path):
+    cache_folder = str(tmp_path / "cache")
+    os.makedirs(cache_folder)
+    urls = write_sheets(cache_folder, 10)
+
+    # Room for two arrays and their headers, as in a server that renders one
+    # deck per job with the same store
+    store = tts.RawSheetStore(str(tmp_path / "store"))
+    store.max_bytes = 2 * SHEET_BYTES + 1024
+    for url in urls:
+        sheet = store.get(url, cache_folder)
+        assert sheet[0, 0, 0] == urls.index(url) * 20
+
+    assert len(store._arrays) == 2
+    assert store_size(store.folder) <= store.max_bytes
+
+    # The sheets mapped last are still mapped and not written again
+    stats = tts.RunStats()
+    store.get(urls[-1], cache_folder, stats)
+    assert stats.counters.get("raw_sheets_written", 0) == 0
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+SHEET_URL = "https://example.invalid/sheets/palette.png"
+COLUMNS = 5
+ROWS = 4
+CARD_SIZE = (200, 280)
+COLORS = [(200, 30, 30), (30, 160, 30), (30, 30, 200), (220, 200, 40)]
+
+
+def write_sheet(cache_folder, mode):
+    # Every card is a single color, so a reduced card is still that color
+    sheet = Image.new("RGB", (COLUMNS * CARD_SIZE[0], ROWS * CARD_SIZE[1]))
+    draw = ImageDraw.Draw(sheet)
+    for index in range(COLUMNS * ROWS):
+        left = (index % COLUMNS) * CARD_SIZE[0]
+        top = (index // COLUMNS) * CARD_SIZE[1]
+        draw.rectangle(
+            [left, top, left + CARD_SIZE[0] - 1, top + CARD_SIZE[1] - 1],
+            fill=COLORS[index % len(COLORS)],
+        )
+    if mode == "P":
+        sheet = sheet.quantize(len(COLORS))
+    elif mode == "PA":
+        # A palette with a transparent entry, as GIF sheets re-encoded to PNG have
+        sheet = sheet.quantize(len(COLORS))
+        sheet.info["transparency"] = 0
+    else:
+        sheet = sheet.convert(mode)
+    sheet.save(os.path.join(cache_folder, tts.format_url(SHEET_URL) + ".png"))
+
+
+@pytest.mark.parametrize("mode", ["P", "PA", "1", "I;16"])
+def test_reduced_decode_of_sheets_that_cant_be_reduced(tmp_path, mode):
+    write_sheet(str(tmp_path), mode)
+
+    # A card height of 20 reduces the 1120 pixel high sheet by a factor of 14
+    sheet = tts.load_sheet(SHEET_URL, str(tmp_path), min_height=20 * ROWS)
+    assert sheet.height == ROWS * CARD_SIZE[1] // 14
+
+    card = tts.extract_sced_card(
+        SHEET_URL, 6, COLUMNS, ROWS, True, str(tmp_path), min_card_height=20
+    )
+    assert card.height == CARD_SIZE[1] // 14
+    if mode in ("P", "PA"):
+        center = (card.width // 2, card.height // 2)
+        assert card.convert("RGB").getpixel(center) == COLORS[6 % len(COLORS)]
+
+
+def test_palette_sheet_at_low_dpi(tmp_path):
+    # The whole render path at a dpi low enough to reduce the sheet
+    write_sheet(str(tmp_path), "P")
+    save_path = tmp_path / "save.json"
+    save_path.write_text(
+        '{"ObjectStates": [{"Nickname": "Card", "CardID": 106, "GMNotes": "",'
+        ' "CustomDeck": {"1": {"FaceURL": "%s", "BackURL": "%s", "NumWidth": 5,'
+        ' "NumHeight": 4, "UniqueBack": false}}}]}' % (SHEET_URL, SHEET_URL)
+    )
+    args = tts.build_arg_parser().parse_args(
+        [
+            str(save_path),
+            "--cachepath",
+            str(tmp_path),
+            "--card-quantity-source",
+            "tts_saved_object",
+            "--dpi",
+            "20",
+            "--workers",
+            "1",
+            "--no-tile-cache",
+            "--output",
+            str(tmp_path / "out.pdf"),
+        ]
+    )
+    args.filepath = args.filepaths[0]
+    tts.render_deck(args)
+
+    with open(tmp_path / "out.pdf", "rb") as f:
+        assert f.read().rstrip().endswith(b"%%EOF")
@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tts_extract_json as tts  # noqa: E402
+
+
+def card(number, nested=None, nested_first=False, face="face"):
+    obj = {}
+    if nested is not None and nested_first:
+        obj["States"] = {"2": nested}
+    obj.update(
+        {
+            "Nickname": f"Card {number}",
+            "CardID": 100 + number,
+            "GMNotes": json.dumps({"id": f"{number:05d}"}),
+            "CustomDeck": {"1": {"FaceURL": face, "NumWidth": 10, "NumHeight": 1}},
+        }
+    )
+    if nested is not None and not nested_first:
+        obj["States"] = {"2": nested}
+    return obj
+
+
+def streamed(save):
+    result = {}
+    tts.add_streamed_cards(tts.iter_card_records(io.StringIO(json.dumps(save))), result)
+    return result
+
+
+def loaded(save):
+    result = {}
+    tts.build_dict(save, result)
+    return result
+
+
+def test_cards_whose_cardid_comes_after_their_states():
+    save = {
+        "ObjectStates": [
+            card(1),
+            card(7, card(8), nested_first=True),
+            card(3, card(4, card(5)), nested_first=False),
+            # A card holding a state with the same id, which build_dict finds later
+            card(9, card(9, face="state face"), nested_first=True),
+        ]
+    }
+    result = streamed(save)
+    assert list(result.items()) == list(loaded(save).items())
+    assert list(result) == [
+        "00001",
+        "00007",
+        "00008",
+        "00003",
+        "00004",
+        "00005",
+        "00009",
+    ]
+    assert result["00009"]["quantity"] == 2
+    assert result["00009"]["CustomDeck"]["1"]["FaceURL"] == "face"
+
+
+def test_copies_add_to_the_quantity():
+    save = {"ObjectStates": [{"ContainedObjects": [card(2)] * 5 + [card(1)]}]}
+    result = streamed(save)
+    assert list(result.items()) == list(loaded(save).items())
+    assert result["00002"]["quantity"] == 5
+
+
+def test_records_are_yielded_before_the_end_of_the_file():
+    objects = [card(number % 50) for number in range(30000)]
+    text = json.dumps({"SaveName": "Big", "ObjectStates": objects})
+    f = io.StringIO(text)
+    next(tts.iter_card_records(f))
+    assert f.tell() < len(text)
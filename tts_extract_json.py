@@ -1,18 +1,33 @@
 import argparse
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+import cProfile
+import hashlib
+import io
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count, repeat
 import json
 import logging
+import math
 import os
+import pstats
+import queue
+import re
+import sqlite3
 import sys
-import tkinter as tk
-from tkinter import filedialog, BooleanVar
+import tempfile
+import threading
+import time
+import tracemalloc
 import webbrowser
+import zlib
 
-import cv2
-import numpy as np
-import pytesseract
 from PIL import Image, ImageFilter
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.request import urlopen
+from urllib3.util.retry import Retry
 
 
 # Define preset page and card sizes in pixels at 300dpi
@@ -30,8 +45,390 @@ COMMON_PLAYER_BACK_URLS = [
     "https://steamusercontent-a.akamaihd.net/ugc/2342503777940352139/A2D42E7E5C43D045D72CE5CFC907E4F886C8C690/",
 ]
 
+# sha256 digests of the files behind the common card back urls, so copies of the
+# backs under other urls are recognized even when these urls were never cached
+COMMON_ENCOUNTER_BACK_SHA256S = set()
+COMMON_PLAYER_BACK_SHA256S = set()
+
+# ArkhamDB card dump and the lookup index that is built next to it
+CARDS_JSON_PATH = "cards.json"
+CARD_INDEX_SUFFIX = ".index.sqlite"
+
+# Default memory budget, in megabytes, for decoded deck sheets kept in memory
+SHEET_CACHE_SIZE_MB = 2048
+
+# Sheets are decoded at a reduced size when that still leaves this many pixels
+# for each pixel of the final card tile. Preview runs use a lower dpi and skip
+# the extra detail entirely.
+REDUCED_DECODE_OVERSAMPLE = 2
+PREVIEW_DPI = 120
+PREVIEW_OVERSAMPLE = 1
+
+# Image modes Pillow can reduce, sheets in other modes are converted first
+REDUCIBLE_MODES = {"RGB", "RGBA", "L", "LA", "CMYK"}
+
+# The cached sheets are indexed in a file beside the cache folder. Bump the
+# version whenever the layout of the index changes.
+CACHE_INDEX_SUFFIX = "_index.json"
+CACHE_INDEX_VERSION = 1
+
+# Settings for prefetching uncached deck sheets before extraction
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF_FACTOR = 0.5
+DOWNLOAD_TIMEOUT = 60
+
+# Finished card tiles are cached on disk beside the TTS image cache. Bump the
+# version whenever the card preparation changes so stale tiles are not reused.
+TILE_CACHE_SIZE_MB = 2048
+TILE_CACHE_SUFFIX = "_tiles"
+TILE_CACHE_VERSION = 1
+
+# Decoded sheets can be kept as memory-mapped arrays beside the TTS image cache
+RAW_SHEET_STORE_SIZE_MB = 8192
+RAW_SHEET_STORE_SUFFIX = "_raw"
+
+# Number of cards tiled into one image for each Tesseract call, and the white
+# space kept between them
+OCR_BATCH_SIZE = 16
+OCR_BATCH_PADDING = 40
+
+# Saves larger than this are scanned incrementally instead of loaded at once
+STREAM_PARSE_THRESHOLD_MB = 64
+STREAM_PARSE_CHUNK_SIZE = 1024 * 1024
+STREAM_PARSE_FIELDS = {"Nickname", "CardID", "CustomDeck", "GMNotes"}
+STREAM_PARSE_BUILT_FIELDS = {"CustomDeck"}
+JSON_TOKEN_RE = re.compile(
+    r'\s*(?:([{}\[\],:])|("[^"\\]*(?:\\.[^"\\]*)*")|([^\s{}\[\],:"]+))'
+)
+
+# Number of functions and allocation sites listed when profiling a run
+PROFILE_TOP_FUNCTIONS = 25
+TRACE_MEMORY_TOP_SITES = 10
+
+# Local render server, and the options that only apply to the server itself
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+JOB_WORKERS = 1
+
+# Options of the server itself, of the caches it builds once at startup, and
+# the cache maintenance that runs instead of it
+SERVER_ONLY_OPTIONS = {
+    "serve",
+    "host",
+    "port",
+    "job_workers",
+    "open_pdf",
+    "sheet_cache_size",
+    "tile_cache_path",
+    "tile_cache_size",
+    "raw_sheet_store_path",
+    "raw_sheet_store_size",
+    "cache_maintenance",
+}
+REPEATED_OPTIONS = {"target"}
+
+# Pages handed between the stages of the pipeline at a time
+PIPELINE_DEPTH = 2
+
+# Settings that can be given for each output target
+TARGET_SETTINGS = ["sheet", "card", "dpi", "margin", "sharpen", "output"]
+
+# Default output file names
+OUTPUT_PDF_PATH = "tts_extract_out.pdf"
+CACHEPATH_FILE = "cachepath.txt"
+
+
+def load_saved_cachepath():
+    # Read the cache path from cachepath.txt if it exists
+    if os.path.exists(CACHEPATH_FILE):
+        with open(CACHEPATH_FILE, "r") as f:
+            return f.read().strip()
+    return None
+
+
+def parse_card_dimension(value):
+    # Card sizes can't be negative, and 0 means the preset is used
+    dimension = int(value)
+    if dimension < 0:
+        raise argparse.ArgumentTypeError("card sizes can't be negative")
+    return dimension
+
+
+class CustomImageSizeAction(argparse.Action):
+    # Like the GUI, a custom size with a 0 in it falls back to the preset
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, tuple(values) if all(values) else None)
+
+
+def parse_target(value):
+    # Read an output target such as "sheet=A4,card=standard,dpi=300,margin=30,sharpen=0"
+    target = {}
+    for item in value.split(","):
+        name, separator, setting = item.partition("=")
+        name, setting = name.strip(), setting.strip()
+        if not separator or name not in TARGET_SETTINGS:
+            raise argparse.ArgumentTypeError(
+                f"unknown target setting {item!r}, "
+                f"expected one of {', '.join(TARGET_SETTINGS)}"
+            )
+        if name == "sheet" and setting not in SHEET_SIZES:
+            raise argparse.ArgumentTypeError(f"unknown sheet size {setting!r}")
+        if name == "card" and setting not in CARD_SIZES:
+            if not re.fullmatch(r"[1-9]\d*x[1-9]\d*", setting):
+                raise argparse.ArgumentTypeError(
+                    f"card must be one of {', '.join(CARD_SIZES)} or WIDTHxLENGTH"
+                )
+        if name in ("dpi", "margin") and not setting.isdigit():
+            raise argparse.ArgumentTypeError(f"{name} must be a whole number")
+        if name == "sharpen" and setting.lower() not in ("0", "1", "false", "true"):
+            raise argparse.ArgumentTypeError("sharpen must be 0 or 1")
+        target[name] = setting
+    return target
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Extract SCED cards from TTS saved objects into printable PDFs. "
+        "Run without arguments to use the GUI."
+    )
+    parser.add_argument(
+        "filepaths",
+        nargs="*",
+        metavar="FILE",
+        help="TTS saved object files; several files are rendered in one run",
+    )
+    parser.add_argument(
+        "--cachepath",
+        default=load_saved_cachepath() or "cache",
+        help="TTS mod images cache folder (default: the folder in cachepath.txt)",
+    )
+    parser.add_argument(
+        "--output",
+        default=OUTPUT_PDF_PATH,
+        help="output PDF file when rendering a single file",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=".",
+        help="folder for the PDF files when rendering several files, "
+        "each named after its TTS file",
+    )
+    parser.add_argument(
+        "--target",
+        dest="targets",
+        action="append",
+        type=parse_target,
+        metavar="SETTINGS",
+        help="render an extra output from the same extracted cards; may be "
+        "repeated. SETTINGS is a comma separated list such as "
+        "sheet=A4,card=standard,dpi=300,margin=30,sharpen=0,output=a4.pdf, "
+        "where unset values come from the other options",
+    )
+    parser.add_argument(
+        "--verbose", action=argparse.BooleanOptionalAction, default=True
+    )
+    parser.add_argument(
+        "--back",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="extract the backs of the cards",
+    )
+    parser.add_argument(
+        "--card-quantity-source",
+        choices=["arkhamdb", "tts_saved_object"],
+        default="arkhamdb",
+    )
+    parser.add_argument("--image-size", choices=list(CARD_SIZES), default="standard")
+    parser.add_argument(
+        "--custom-image-size",
+        nargs=2,
+        type=parse_card_dimension,
+        action=CustomImageSizeAction,
+        metavar=("WIDTH", "LENGTH"),
+        help="custom card size in pixels, used instead of --image-size "
+        "unless either of them is 0",
+    )
+    parser.add_argument("--sheet-size", choices=list(SHEET_SIZES), default="Letter")
+    parser.add_argument("--margin-size", type=int, default=30)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument(
+        "--exclude-player-card-backs",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--exclude-encounter-card-backs",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+    )
+    parser.add_argument(
+        "--sharpen-text",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="sharpen text detected with Tesseract OCR (experimental)",
+    )
+    parser.add_argument(
+        "--unique-card-images",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="embed each unique card image once in the PDF",
+    )
+    parser.add_argument(
+        "--sheet-cache-size",
+        type=int,
+        default=SHEET_CACHE_SIZE_MB,
+        help="memory budget in MB for decoded deck sheets",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes used to prepare the cards",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=DOWNLOAD_WORKERS,
+        help="concurrent downloads of uncached sheets",
+    )
+    parser.add_argument(
+        "--cache-index",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="identify cached sheets by their content, so identical sheets under "
+        "different urls are downloaded, decoded and cut only once",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="disk budget in MB for the sheets this tool downloads into the cache "
+        "folder; the least recently used ones are deleted when it is exceeded "
+        "(default: no limit). Files written by TTS are never deleted",
+    )
+    parser.add_argument(
+        "--cache-maintenance",
+        choices=["verify", "rebuild"],
+        help="check the cache index against the cache folder, or index the "
+        "folder from scratch, then exit",
+    )
+    parser.add_argument(
+        "--tile-cache",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="reuse finished card tiles from earlier runs",
+    )
+    parser.add_argument(
+        "--tile-cache-path",
+        help="folder for finished card tiles "
+        f"(default: the cache folder name followed by {TILE_CACHE_SUFFIX})",
+    )
+    parser.add_argument(
+        "--tile-cache-size",
+        type=int,
+        default=TILE_CACHE_SIZE_MB,
+        help="disk budget in MB for finished card tiles",
+    )
+    parser.add_argument(
+        "--raw-sheet-store",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="keep decoded sheets as uncompressed memory-mapped files and cut "
+        "the cards out of those instead of decoding the sheets into memory",
+    )
+    parser.add_argument(
+        "--raw-sheet-store-path",
+        help="folder for the uncompressed sheets "
+        f"(default: the cache folder name followed by {RAW_SHEET_STORE_SUFFIX})",
+    )
+    parser.add_argument(
+        "--raw-sheet-store-size",
+        type=int,
+        default=RAW_SHEET_STORE_SIZE_MB,
+        help="disk budget in MB for the uncompressed sheets",
+    )
+    parser.add_argument(
+        "--reduced-decode",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="decode deck sheets at a reduced size when the cards are printed "
+        "much smaller than the sheet resolution",
+    )
+    parser.add_argument(
+        "--preview",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=f"render a quick low resolution preview at {PREVIEW_DPI} dpi "
+        "to check the layout",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="download, cut, compose and write the pages in overlapping "
+        "stages, so the first pages are written while later sheets are still "
+        "downloading (not used with --incremental, --unique-card-images or "
+        "--target)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="only compose the pages that changed since the last run",
+    )
+    parser.add_argument(
+        "--stream-parse",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="scan the TTS file incrementally instead of loading it at once "
+        f"(default: only for files over {STREAM_PARSE_THRESHOLD_MB} MB)",
+    )
+    parser.add_argument(
+        "--report",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="write a JSON report of the time spent in each stage next to the PDF",
+    )
+    parser.add_argument(
+        "--profile",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="profile the run with cProfile and save the stats next to the PDF",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="trace memory allocations with tracemalloc and add them to the report",
+    )
+    parser.add_argument(
+        "--serve",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="run a local render server that takes jobs over HTTP and keeps the "
+        "caches warm between them; the other options become the job defaults",
+    )
+    parser.add_argument("--host", default=SERVE_HOST, help="address to serve on")
+    parser.add_argument("--port", type=int, default=SERVE_PORT, help="port to serve on")
+    parser.add_argument(
+        "--job-workers",
+        type=int,
+        default=JOB_WORKERS,
+        help="render jobs the server runs at the same time",
+    )
+    parser.add_argument(
+        "--open-pdf",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="open the PDF when it is done",
+    )
+    return parser
+
 
 def parse_args():
+    import tkinter as tk
+    from tkinter import filedialog, BooleanVar
+
     # Create a new tkinter window
     window = tk.Tk()
     window.title("TTS Extract JSON")
@@ -47,14 +444,19 @@ def parse_args():
     sheet_size = tk.StringVar(value="Letter")
     margin_size = tk.IntVar(value=30)
     dpi = tk.IntVar(value=300)
+    sheet_cache_size = tk.IntVar(value=SHEET_CACHE_SIZE_MB)
+    workers = tk.IntVar(value=os.cpu_count() or 1)
     exclude_player_card_backs = BooleanVar()
     exclude_encounter_card_backs = BooleanVar()
     sharpen_text = BooleanVar()  # Checkbox for sharpening text
+    unique_card_images = BooleanVar()
+    incremental = BooleanVar()
+    preview = BooleanVar()
 
     # Read the cache path from cachepath.txt if it exists
-    if os.path.exists("cachepath.txt"):
-        with open("cachepath.txt", "r") as f:
-            cachepath.set(f.read().strip())
+    saved_cachepath = load_saved_cachepath()
+    if saved_cachepath is not None:
+        cachepath.set(saved_cachepath)
 
     # Create a button to select the file
     def select_file():
@@ -68,7 +470,7 @@ def parse_args():
     # Create a button to select the cache folder of tabletop simulator
     def select_cache_folder():
         cachepath.set(filedialog.askdirectory())
-        with open("cachepath.txt", "w") as f:
+        with open(CACHEPATH_FILE, "w") as f:
             f.write(cachepath.get())
 
     select_cache_folder_button = tk.Button(
@@ -183,6 +585,26 @@ def parse_args():
     dpi_entry = tk.Entry(dpi_frame, textvariable=dpi)
     dpi_entry.pack(side=tk.LEFT, anchor="w")
 
+    sheet_cache_size_frame = tk.Frame(window)
+    sheet_cache_size_frame.pack(pady=5, padx=5, anchor="w")
+
+    sheet_cache_size_label = tk.Label(
+        sheet_cache_size_frame, text="Sheet Cache Memory (MB):"
+    )
+    sheet_cache_size_label.pack(side=tk.LEFT, anchor="w")
+    sheet_cache_size_entry = tk.Entry(
+        sheet_cache_size_frame, textvariable=sheet_cache_size
+    )
+    sheet_cache_size_entry.pack(side=tk.LEFT, anchor="w")
+
+    workers_frame = tk.Frame(window)
+    workers_frame.pack(pady=5, padx=5, anchor="w")
+
+    workers_label = tk.Label(workers_frame, text="Worker Processes:")
+    workers_label.pack(side=tk.LEFT, anchor="w")
+    workers_entry = tk.Entry(workers_frame, textvariable=workers)
+    workers_entry.pack(side=tk.LEFT, anchor="w")
+
     # Add a separator
     separator = tk.Frame(window, height=2, bd=1, relief=tk.SUNKEN)
     separator.pack(fill=tk.X, padx=5, pady=5)
@@ -215,11 +637,33 @@ def parse_args():
     )
     sharpen_text_checkbox.pack(pady=5, padx=5, anchor="w")
 
-    # Create a button to start the script
-    args = argparse.Namespace()
+    unique_card_images_checkbox = tk.Checkbutton(
+        window,
+        text="Embed each unique card image once (smaller PDF)",
+        variable=unique_card_images,
+    )
+    unique_card_images_checkbox.pack(pady=5, padx=5, anchor="w")
+
+    incremental_checkbox = tk.Checkbutton(
+        window,
+        text="Only rebuild pages that changed since the last run",
+        variable=incremental,
+    )
+    incremental_checkbox.pack(pady=5, padx=5, anchor="w")
+
+    preview_checkbox = tk.Checkbutton(
+        window,
+        text=f"Quick preview at {PREVIEW_DPI} dpi (ignores the dpi field)",
+        variable=preview,
+    )
+    preview_checkbox.pack(pady=5, padx=5, anchor="w")
+
+    # Create a button to start the script, starting from the command line defaults
+    args = build_arg_parser().parse_args([])
+    args.open_pdf = True
 
     def start_script():
-        args.filepath = filepath.get()
+        args.filepaths = [filepath.get()]
         args.cachepath = cachepath.get()
         args.verbose = verbose.get()
         args.back = back.get()
@@ -241,9 +685,14 @@ def parse_args():
         args.sheet_size = sheet_size.get()
         args.margin_size = margin_size.get()
         args.dpi = dpi.get()
+        args.sheet_cache_size = sheet_cache_size.get()
+        args.workers = workers.get()
         args.exclude_player_card_backs = exclude_player_card_backs.get()
         args.exclude_encounter_card_backs = exclude_encounter_card_backs.get()
         args.sharpen_text = sharpen_text.get()  # Store the value of sharpen_text
+        args.unique_card_images = unique_card_images.get()
+        args.incremental = incremental.get()
+        args.preview = preview.get()
 
         window.quit()
 
@@ -264,43 +713,677 @@ def parse_args():
     return args
 
 
+class RunStats:
+    # Records how long each stage of a run takes and counts events such as cache
+    # hits and downloaded bytes. Stages that run on several threads or worker
+    # processes add up the time spent in each of them, so the total of a stage
+    # can be longer than the run itself.
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Stats are sent back from the worker processes without their lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            stage["calls"] += calls
+            stage["seconds"] += seconds
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, other):
+        for name, stage in other.stages.items():
+            self.add_time(name, stage["seconds"], stage["calls"])
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+
+    def report(self, **extra):
+        return {
+            "wall_seconds": round(time.perf_counter() - self.start_time, 4),
+            "stages": {
+                name: {"calls": stage["calls"], "seconds": round(stage["seconds"], 4)}
+                for name, stage in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            **extra,
+        }
+
+    def log_summary(self):
+        wall_seconds = time.perf_counter() - self.start_time
+        lines = [f"{'Stage':<12} {'Calls':>8} {'Seconds':>10} {'% of run':>9}"]
+        for name, stage in self.stages.items():
+            share = 100 * stage["seconds"] / wall_seconds if wall_seconds else 0
+            lines.append(
+                f"{name:<12} {stage['calls']:>8} {stage['seconds']:>10.2f} {share:>8.1f}%"
+            )
+        lines.append(f"{'run':<12} {'':>8} {wall_seconds:>10.2f}")
+        for name, amount in self.counters.items():
+            lines.append(f"{name}: {amount}")
+        logging.info("\n".join(lines))
+
+
+def card_id(obj):
+    # If the dictionary has 'Nickname', 'CardID', and 'CustomDeck' keys, return
+    # the key of its entry in the result and its ArkhamDB id
+    if obj.get("Nickname") != "" and "CardID" in obj and "CustomDeck" in obj:
+        arkhamdb_id = None
+        if "GMNotes" in obj:
+            try:
+                gmnotes = json.loads(obj["GMNotes"]) if "GMNotes" in obj else None
+                arkhamdb_id = gmnotes["id"] if gmnotes else None
+            except json.decoder.JSONDecodeError:
+                logging.warning(f"JSON decode error for the following object: {obj}")
+                arkhamdb_id = None
+        obj_key = arkhamdb_id if arkhamdb_id else obj["Nickname"]
+        return obj_key, arkhamdb_id
+    return None
+
+
+def card_entry(obj, arkhamdb_id):
+    return {
+        "CardID": obj["CardID"],
+        "CustomDeck": obj["CustomDeck"],
+        "quantity": 1,
+        "Nickname": obj["Nickname"],
+        "GMNotes": obj["GMNotes"] if "GMNotes" in obj else None,
+        "arkhamdb_id": arkhamdb_id,
+    }
+
+
+def add_card(obj, result):
+    ids = card_id(obj)
+    if ids is None:
+        return
+    obj_key, arkhamdb_id = ids
+    # If the nickname is not yet in the result, add it with a new dictionary as value
+    if obj_key not in result:
+        result[obj_key] = card_entry(obj, arkhamdb_id)
+    else:
+        # If the nickname is already in the result, increment the quantity
+        result[obj_key]["quantity"] += 1
+
+
+def add_streamed_cards(records, result):
+    # Merge the cards streamed by iter_card_records into the result the same way
+    # build_dict would. Copies of a card only add to its quantity, and the first
+    # copy in build_dict's order gives the fields, so memory follows the number
+    # of distinct cards.
+    cards = {}
+    for position, obj in records:
+        ids = card_id(obj)
+        if ids is None:
+            continue
+        obj_key, arkhamdb_id = ids
+        if obj_key not in cards:
+            cards[obj_key] = (position, card_entry(obj, arkhamdb_id))
+        elif position < cards[obj_key][0]:
+            # A card that contains an earlier found copy of itself comes first
+            entry = card_entry(obj, arkhamdb_id)
+            entry["quantity"] += cards[obj_key][1]["quantity"]
+            cards[obj_key] = (position, entry)
+        else:
+            cards[obj_key][1]["quantity"] += 1
+
+    # Add the cards in the order build_dict finds them
+    for obj_key, (_, entry) in sorted(cards.items(), key=lambda item: item[1][0]):
+        if obj_key in result:
+            result[obj_key]["quantity"] += entry["quantity"]
+        else:
+            result[obj_key] = entry
+
+
 def build_dict(obj, result):
-    # If the object is a dictionary
-    if isinstance(obj, dict):
-        # If the dictionary has 'Nickname', 'CardID', and 'CustomDeck' keys, add an entry to the result
-        if obj.get("Nickname") != "" and "CardID" in obj and "CustomDeck" in obj:
-            arkhamdb_id = None
-            if "GMNotes" in obj:
-                try:
-                    gmnotes = json.loads(obj["GMNotes"]) if "GMNotes" in obj else None
-                    arkhamdb_id = gmnotes["id"] if gmnotes else None
-                except json.decoder.JSONDecodeError:
-                    logging.warning(
-                        f"JSON decode error for the following object: {obj}"
-                    )
-                    arkhamdb_id = None
-            obj_key = arkhamdb_id if arkhamdb_id else obj["Nickname"]
-            # If the nickname is not yet in the result, add it with a new dictionary as value
-            if obj_key not in result:
-                result[obj_key] = {
-                    "CardID": obj["CardID"],
-                    "CustomDeck": obj["CustomDeck"],
-                    "quantity": 1,
-                    "Nickname": obj["Nickname"],
-                    "GMNotes": obj["GMNotes"] if "GMNotes" in obj else None,
-                    "arkhamdb_id": arkhamdb_id,
-                }
+    # Walk the objects depth first with an explicit stack, so deeply nested
+    # saves can't hit the recursion limit
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        # If the object is a dictionary
+        if isinstance(obj, dict):
+            add_card(obj, result)
+            # Search the dictionary's values, in order
+            stack.extend(reversed(list(obj.values())))
+        # If the object is a list
+        elif isinstance(obj, list):
+            # Search the list's items, in order
+            stack.extend(reversed(obj))
+
+
+def iter_json_tokens(f, chunk_size=STREAM_PARSE_CHUNK_SIZE):
+    # Yields (kind, raw token) pairs from a JSON file while reading it in chunks.
+    # Strings and literals are left undecoded so that skipped values cost nothing
+    # beyond scanning them.
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        match = JSON_TOKEN_RE.match(buffer, position)
+
+        # Read more when the token may continue past the end of the buffer
+        if not eof and (match is None or match.end() == len(buffer)):
+            chunk = f.read(max(chunk_size, len(buffer) - position))
+            buffer = buffer[position:] + chunk
+            position = 0
+            eof = not chunk
+            continue
+
+        if match is None:
+            if buffer[position:].strip():
+                raise ValueError(f"Invalid JSON near: {buffer[position:position + 50]}")
+            return
+
+        position = match.end()
+        punctuation, string, literal = match.groups()
+        if punctuation:
+            yield punctuation, punctuation
+        elif string is not None:
+            yield "string", string
+        else:
+            yield "literal", literal
+
+
+class _JsonFrame:
+    __slots__ = ["is_dict", "key", "fields", "built", "position"]
+
+    def __init__(self, is_dict, building, position):
+        self.is_dict = is_dict
+        # The key whose value comes next, when this frame is a dictionary
+        self.key = None
+        # The card fields found so far in a dictionary that is only scanned
+        self.fields = {} if is_dict and not building else None
+        # The container being built when the value itself is needed
+        self.built = ({} if is_dict else []) if building else None
+        # How many containers were opened before this one, which is the order
+        # build_dict visits them in
+        self.position = position
+
+
+def iter_card_records(f):
+    # Scans a TTS save incrementally and yields the position and a dictionary
+    # with the card fields (Nickname, CardID, CustomDeck and GMNotes) of every
+    # object that has them, as soon as the object is closed. An object closes
+    # after the objects nested in it, while build_dict finds it before them, so
+    # the position tells the order build_dict would find it in. Only CustomDeck
+    # values are built, and memory is bounded by the nesting depth of the save.
+    stack = []
+    opened = count()
+    for kind, token in iter_json_tokens(f):
+        if kind == "," or kind == ":":
+            continue
+        frame = stack[-1] if stack else None
+
+        # Inside a dictionary, a string without a pending key is the next key
+        if (
+            kind == "string"
+            and frame is not None
+            and frame.is_dict
+            and frame.key is None
+        ):
+            frame.key = json.loads(token)
+            continue
+
+        if kind == "{" or kind == "[":
+            building = frame is not None and (
+                frame.built is not None or frame.key in STREAM_PARSE_BUILT_FIELDS
+            )
+            stack.append(_JsonFrame(kind == "{", building, next(opened)))
+            continue
+
+        if kind == "}" or kind == "]":
+            done = stack.pop()
+            value = done.built
+            if done.fields is not None and "CardID" in done.fields:
+                if "CustomDeck" in done.fields:
+                    yield done.position, done.fields
+            frame = stack[-1] if stack else None
+        else:
+            value = token
+
+        # Store the finished value in its parent
+        if frame is None:
+            continue
+        if frame.built is not None:
+            if not isinstance(value, (dict, list)):
+                value = json.loads(value)
+            if frame.is_dict:
+                frame.built[frame.key] = value
             else:
-                # If the nickname is already in the result, increment the quantity
-                result[obj_key]["quantity"] += 1
-        # Recursively search the dictionary's values
-        for value in obj.values():
-            build_dict(value, result)
-    # If the object is a list
-    elif isinstance(obj, list):
-        # Recursively search the list's items
-        for item in obj:
-            build_dict(item, result)
+                frame.built.append(value)
+        elif frame.fields is not None and frame.key in STREAM_PARSE_FIELDS:
+            frame.fields[frame.key] = (
+                value if isinstance(value, (dict, list)) else json.loads(value)
+            )
+        if frame.is_dict:
+            frame.key = None
+
+
+def build_dict_from_file(filepath, result, stream_parse=None):
+    # Stream large saves instead of loading the whole object tree
+    if stream_parse is None:
+        stream_parse = (
+            os.path.getsize(filepath) > STREAM_PARSE_THRESHOLD_MB * 1024 * 1024
+        )
+
+    with open(filepath, "r") as f:
+        if stream_parse:
+            logging.info(f"Streaming cards from {filepath}")
+            add_streamed_cards(iter_card_records(f), result)
+        else:
+            # Load the JSON data
+            build_dict(json.load(f), result)
+
+
+def format_url(url_string):
+    for char in [
+        ":",
+        "/",
+        ".",
+        "-",
+    ]:
+        url_string = url_string.replace(char, "")
+    return url_string
+
+
+class SheetCache:
+    # Keeps decoded deck sheets in memory, keyed by their sheet key and the size
+    # they were decoded at, so that each sheet is decoded only once no matter how
+    # many cards are cut from it.
+    # The least recently used sheets are evicted once the decoded pixel data
+    # exceeds the memory budget.
+    def __init__(self, max_size_mb=SHEET_CACHE_SIZE_MB):
+        self.max_bytes = int(max_size_mb) * 1024 * 1024
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._sheets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(img):
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, sheet_key, min_height=None):
+        key = (sheet_key, min_height)
+        with self._lock:
+            img = self._sheets.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._sheets.move_to_end(key)
+            return img
+
+    def put(self, sheet_key, img, min_height=None):
+        key = (sheet_key, min_height)
+        size = self.image_bytes(img)
+
+        # A sheet larger than the whole budget is never kept
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._sheets:
+                self.current_bytes -= self.image_bytes(self._sheets.pop(key))
+            self._sheets[key] = img
+            self.current_bytes += size
+
+            # Evict the least recently used sheets until we are within budget
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._sheets.popitem(last=False)
+                self.current_bytes -= self.image_bytes(evicted)
+
+    def log_stats(self):
+        logging.info(
+            f"Sheet cache: {self.hits} hits, {self.misses} misses, "
+            f"{len(self._sheets)} sheets held ({self.current_bytes // (1024 * 1024)} MB)"
+        )
+
+
+def find_cached_sheet(url, cache_folder="cache"):
+    # Check if the image file is saved locally in the cache folder
+    cache_file_name = format_url(url)
+    for extension in [".png", ".jpg"]:
+        cache_file_path = os.path.join(cache_folder, cache_file_name + extension)
+        if os.path.exists(cache_file_path):
+            return cache_file_path
+    return None
+
+
+def write_file_atomic(path, data):
+    # Write to a temporary file first so that an interrupted run never leaves a
+    # truncated file behind in a cache folder
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def sniff_image_extension(data):
+    # Recognize the formats TTS stores in its cache from their leading bytes
+    if data.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    return None
+
+
+def save_sheet_to_cache(data, url, cache_folder="cache"):
+    # Keep the downloaded bytes as they are, under the name TTS would use, and
+    # only re-encode to PNG when the format can't be told from the bytes
+    extension = sniff_image_extension(data)
+    if extension is None:
+        buffer = io.BytesIO()
+        Image.open(io.BytesIO(data)).save(buffer, "PNG")
+        data = buffer.getvalue()
+        extension = ".png"
+    cache_file_path = os.path.join(cache_folder, format_url(url) + extension)
+
+    write_file_atomic(cache_file_path, data)
+    logging.info(f"Saved image to cache: {cache_file_path}")
+    return cache_file_path
+
+
+def normalize_url(url):
+    # Spellings of a sheet url that always point at the same file
+    url = url.strip().rstrip("/")
+    scheme, separator, rest = url.partition("://")
+    if not separator:
+        return url
+    host, slash, path = rest.partition("/")
+    if scheme.lower() == "http":
+        scheme = "https"
+    return f"{scheme.lower()}://{host.lower()}{slash}{path}"
+
+
+class CacheIndex:
+    # Indexes the sheets in the TTS image cache folder in a file next to it, so
+    # the folder is not searched again for every sheet. Each file is listed by
+    # its cache key (the file name TTS uses) with its format, size, sha256, when
+    # it was last used and whether this tool downloaded it, and each normalized
+    # url points at the file it was found in. Sheets that are identical under
+    # different urls then share one decoded copy and one set of card tiles, and
+    # a url that only differs from a cached one by a trailing slash or its
+    # scheme is never downloaded again. When a size budget is given, the least
+    # recently used files this tool downloaded are deleted to stay within it;
+    # files written by TTS itself are never deleted.
+    def __init__(self, path, cache_folder="cache", max_size_mb=None):
+        self.path = path
+        self.cache_folder = cache_folder
+        self.max_bytes = None if max_size_mb is None else int(max_size_mb) * 1024**2
+        self.files = {}
+        self.urls = {}
+        self._checked = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == CACHE_INDEX_VERSION:
+                    self.files = data["files"]
+                    self.urls = data["urls"]
+            except (OSError, ValueError, KeyError):
+                logging.warning(f"Ignoring unreadable cache index {path}")
+
+    def _file_path(self, cache_key):
+        return os.path.join(
+            self.cache_folder, cache_key + self.files[cache_key]["format"]
+        )
+
+    def _is_current(self, cache_key):
+        # Trust an entry while its file keeps the size and time it was hashed at
+        entry = self.files[cache_key]
+        try:
+            stat = os.stat(self._file_path(cache_key))
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def _add_file(self, cache_file_path, data=None, owned=False, last_used=None):
+        if data is None:
+            with open(cache_file_path, "rb") as f:
+                data = f.read()
+        stat = os.stat(cache_file_path)
+        cache_key, extension = os.path.splitext(os.path.basename(cache_file_path))
+        with self._lock:
+            self.files[cache_key] = {
+                "format": extension,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "last_used": last_used or int(time.time()),
+                "owned": owned,
+            }
+            self._dirty = True
+        return cache_key
+
+    def record(self, url, cache_file_path, data=None, owned=False):
+        cache_key = self._add_file(cache_file_path, data, owned)
+        with self._lock:
+            self.urls[normalize_url(url)] = cache_key
+            self._checked.add(cache_key)
+        return self.files[cache_key]
+
+    def _use(self, url, cache_key):
+        # Mark the file as used by this run and remember where the url points
+        with self._lock:
+            if cache_key not in self._checked:
+                self.files[cache_key]["last_used"] = int(time.time())
+                self._checked.add(cache_key)
+                self._dirty = True
+            if self.urls.get(normalize_url(url)) != cache_key:
+                self.urls[normalize_url(url)] = cache_key
+                self._dirty = True
+        return self.files[cache_key]
+
+    def _entry(self, url):
+        # Try the file the url was last found in, then the url's own file name
+        for cache_key in (self.urls.get(normalize_url(url)), format_url(url)):
+            if cache_key in self.files and (
+                cache_key in self._checked or self._is_current(cache_key)
+            ):
+                return self._use(url, cache_key)
+
+        # Search the folder for a url the index doesn't know yet, or whose file
+        # changed since it was indexed
+        cache_file_path = find_cached_sheet(url, self.cache_folder)
+        if cache_file_path is None:
+            return None
+        owned = self.files.get(format_url(url), {}).get("owned", False)
+        return self.record(url, cache_file_path, owned=owned)
+
+    def find(self, url):
+        entry = self._entry(url)
+        if entry is None:
+            return None
+        return self._file_path(self.urls[normalize_url(url)])
+
+    def content_hash(self, url):
+        entry = self._entry(url)
+        return entry["sha256"] if entry is not None else None
+
+    def _remove(self, cache_key):
+        del self.files[cache_key]
+        self.urls = {url: key for url, key in self.urls.items() if key != cache_key}
+        self._dirty = True
+
+    def evict(self):
+        # Delete the least recently used files this tool downloaded until they
+        # fit the budget, keeping the files used by the current run
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            owned = sorted(
+                (entry["last_used"], cache_key)
+                for cache_key, entry in self.files.items()
+                if entry["owned"]
+            )
+            owned_bytes = sum(self.files[cache_key]["size"] for _, cache_key in owned)
+            for _, cache_key in owned:
+                if owned_bytes <= self.max_bytes:
+                    break
+                if cache_key in self._checked:
+                    continue
+                owned_bytes -= self.files[cache_key]["size"]
+                try:
+                    os.remove(self._file_path(cache_key))
+                except FileNotFoundError:
+                    pass
+                logging.info(f"Evicted {cache_key} from the cache folder")
+                self._remove(cache_key)
+
+    def verify(self):
+        # Check every indexed file against its size, time and hash, drop the
+        # ones that are gone and hash the changed ones again
+        missing = changed = 0
+        for cache_key in list(self.files):
+            entry = self.files[cache_key]
+            cache_file_path = self._file_path(cache_key)
+            if not os.path.exists(cache_file_path):
+                missing += 1
+                self._remove(cache_key)
+                continue
+            with open(cache_file_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if not self._is_current(cache_key) or digest != entry["sha256"]:
+                changed += 1
+                self._add_file(
+                    cache_file_path, owned=entry["owned"], last_used=entry["last_used"]
+                )
+        logging.info(
+            f"Verified {len(self.files)} cached sheets: "
+            f"{missing} missing, {changed} changed"
+        )
+
+    def rebuild(self):
+        # Index every image file in the cache folder again, keeping what is
+        # known about the files that are still there
+        previous = self.files
+        self.files = {}
+        for entry in os.scandir(self.cache_folder):
+            cache_key, extension = os.path.splitext(entry.name)
+            if not entry.is_file() or extension not in (".png", ".jpg"):
+                continue
+            old_entry = previous.get(cache_key, {})
+            self._add_file(
+                entry.path,
+                owned=old_entry.get("owned", False),
+                last_used=old_entry.get("last_used"),
+            )
+        self.urls = {url: key for url, key in self.urls.items() if key in self.files}
+        self._dirty = True
+        logging.info(f"Indexed {len(self.files)} cached sheets")
+
+    def size_stats(self):
+        owned_bytes = sum(
+            entry["size"] for entry in self.files.values() if entry["owned"]
+        )
+        total_bytes = sum(entry["size"] for entry in self.files.values())
+        return total_bytes, owned_bytes
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(
+                {
+                    "version": CACHE_INDEX_VERSION,
+                    "files": self.files,
+                    "urls": self.urls,
+                },
+                indent=1,
+            ).encode()
+            self._dirty = False
+        write_file_atomic(self.path, data)
+
+
+def create_cache_index(args):
+    if not args.cache_index:
+        return None
+    return CacheIndex(
+        os.path.normpath(args.cachepath) + CACHE_INDEX_SUFFIX,
+        args.cachepath,
+        args.cache_size,
+    )
+
+
+def locate_sheet(url, cache_folder="cache", cache_index=None):
+    if cache_index is not None:
+        return cache_index.find(url)
+    return find_cached_sheet(url, cache_folder)
+
+
+def sheet_key(url, cache_index=None):
+    # Sheets with the same content share a key once their hash is known
+    digest = cache_index.content_hash(url) if cache_index is not None else None
+    return digest or format_url(url)
+
+
+def load_sheet(
+    url, cache_folder="cache", stats=None, min_height=None, cache_index=None
+):
+    if stats is None:
+        stats = RunStats()
+
+    cache_file_path = locate_sheet(url, cache_folder, cache_index)
+    if not cache_file_path:
+        # Download the image file and save it to the cache folder
+        with stats.stage("download"), urlopen(url) as response:
+            data = response.read()
+            cache_file_path = save_sheet_to_cache(data, url, cache_folder)
+        if cache_index is not None:
+            cache_index.record(url, cache_file_path, data, owned=True)
+        stats.count("sheets_downloaded")
+        stats.count("bytes_downloaded", len(data))
+
+    # Open the cached image file and decode the pixel data now so the file
+    # handle is released
+    with stats.stage("decode"):
+        img = Image.open(cache_file_path)
+
+        # JPEG sheets can be decoded directly at 1/2, 1/4 or 1/8 scale, as long
+        # as at least min_height rows remain
+        if min_height is not None and img.height > min_height:
+            width = math.ceil(img.width * min_height / img.height)
+            img.draft(img.mode, (width, min_height))
+        img.load()
+
+        # Other formats are shrunk by a whole factor after decoding. Palette
+        # and other modes that can't be reduced are converted first, the same
+        # way the cards are converted once they are cut.
+        if min_height is not None and img.height >= 2 * min_height:
+            if img.mode not in REDUCIBLE_MODES:
+                img = img.convert("RGBA" if has_transparency(img) else "RGB")
+            img = img.reduce(img.height // min_height)
+    stats.count("sheets_decoded")
+    return img
 
 
 def extract_sced_card(
@@ -310,43 +1393,47 @@ def extract_sced_card(
     num_height,
     unique_back=False,
     cache_folder="cache",
+    sheet_cache=None,
+    stats=None,
+    min_card_height=None,
+    raw_sheet_store=None,
+    cache_index=None,
 ):
-    def format_url(url_string):
-        for char in [
-            ":",
-            "/",
-            ".",
-            "-",
-        ]:
-            url_string = url_string.replace(char, "")
-        return url_string
-
-    # Check if the image file is saved locally in the cache folder
-    cache_file_name = format_url(url)
-    cache_file_path_png = os.path.join(cache_folder, cache_file_name + ".png")
-    cache_file_path_jpg = os.path.join(cache_folder, cache_file_name + ".jpg")
-
-    if os.path.exists(cache_file_path_png):
-        # Open the PNG image file
-        img = Image.open(cache_file_path_png)
-    elif os.path.exists(cache_file_path_jpg):
-        # Open the JPG image file
-        img = Image.open(cache_file_path_jpg)
+    if stats is None:
+        stats = RunStats()
+
+    # When the cards only need to be min_card_height pixels high, the sheet
+    # may be decoded at a reduced size
+    min_height = None
+    if min_card_height is not None:
+        min_height = min_card_height * (num_height if unique_back else 1)
+
+    if raw_sheet_store is not None:
+        # Slice the card out of the memory-mapped sheet, so only the pixels of
+        # the card itself are read and copied
+        sheet = raw_sheet_store.get(url, cache_folder, stats, min_height, cache_index)
+        sheet_size = (sheet.shape[1], sheet.shape[0])
+        if not unique_back:
+            return Image.fromarray(sheet)
     else:
-        # Open the image file
-        img = Image.open(urlopen(url))
-
-        # Save the image file to the cache folder
-        os.makedirs(cache_folder, exist_ok=True)
-        img.save(cache_file_path_png, "PNG")
-        logging.info(f"Saved PNG image to cache: {cache_file_path_png}")
-
-    # If unique_back is False, return the entire image without cropping
-    if not unique_back:
-        return img
+        # Reuse the decoded sheet if another card was already cut from it
+        key = sheet_key(url, cache_index)
+        img = sheet_cache.get(key, min_height) if sheet_cache is not None else None
+        if img is None:
+            stats.count("sheet_cache_misses")
+            img = load_sheet(url, cache_folder, stats, min_height, cache_index)
+            if sheet_cache is not None:
+                sheet_cache.put(sheet_key(url, cache_index), img, min_height)
+        else:
+            stats.count("sheet_cache_hits")
+        sheet_size = img.size
+
+        # If unique_back is False, return the entire image without cropping
+        if not unique_back:
+            return img
 
     # Calculate the size of the card using the number of cards in the x and y directions
-    card_size = (img.width // num_width, img.height // num_height)
+    card_size = (sheet_size[0] // num_width, sheet_size[1] // num_height)
 
     # Calculate the bounding box of the card
     y_coordinate = card_index // num_width
@@ -359,50 +1446,506 @@ def extract_sced_card(
     bbox = (left, upper, right, lower)
 
     # Crop out the card
-    card = img.crop(bbox)
+    with stats.stage("crop"):
+        if raw_sheet_store is not None:
+            card = Image.fromarray(sheet[upper:lower, left:right])
+        else:
+            card = img.crop(bbox)
 
     return card
 
 
-def extract_images(args):
-    if args.card_quantity_source == "arkhamdb":
-        all_cards_data = json.load(open("cards.json", "r"))
-
-    # Load the JSON data
-    data = json.load(open(args.filepath, "r"))
-
-    # Build the dictionary
-    result = {}
-    build_dict(data, result)
+def collect_sheet_urls(result, back=False):
+    # Gather every distinct sheet url referenced by the cards, in order
+    urls = {}
+    for each in result.values():
+        for deck in each["CustomDeck"].values():
+            urls[deck["FaceURL"]] = None
+            if back:
+                urls[deck["BackURL"]] = None
+    return list(urls)
+
+
+def create_download_session(workers=DOWNLOAD_WORKERS):
+    # Reuse connections between downloads and retry transient failures
+    retry = Retry(
+        total=DOWNLOAD_RETRIES,
+        backoff_factor=DOWNLOAD_BACKOFF_FACTOR,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(
+        pool_connections=workers, pool_maxsize=workers, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_sheet(session, url, cache_folder="cache", stats=None, cache_index=None):
+    if stats is None:
+        stats = RunStats()
+    with stats.stage("download"):
+        response = session.get(url, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        cache_file_path = save_sheet_to_cache(response.content, url, cache_folder)
+    if cache_index is not None:
+        cache_index.record(url, cache_file_path, response.content, owned=True)
+    stats.count("sheets_downloaded")
+    stats.count("bytes_downloaded", len(response.content))
+    return cache_file_path
+
+
+def prefetch_sheets(
+    urls, cache_folder="cache", workers=DOWNLOAD_WORKERS, stats=None, cache_index=None
+):
+    # Only download the sheets that are not in the cache folder yet, and only
+    # one of the spellings of the same url
+    missing = {}
+    for url in urls:
+        if not locate_sheet(url, cache_folder, cache_index):
+            missing.setdefault(normalize_url(url), url)
+    missing = list(missing.values())
+    if not missing:
+        return
+
+    logging.info(f"Downloading {len(missing)} uncached sheets...")
+    session = create_download_session(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                download_sheet, session, url, cache_folder, stats, cache_index
+            ): url
+            for url in missing
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            url = futures[future]
+            try:
+                future.result()
+                logging.info(f"Downloaded sheet {done}/{len(missing)}: {url}")
+            except Exception as e:
+                # The sheet is fetched again when the card is extracted
+                logging.warning(f"Failed to download sheet {url}: {e}")
+    session.close()
+
+
+class TileCache:
+    # Keeps finished card tiles (cropped, resized and optionally sharpened) on
+    # disk so that reruns of an unchanged deck skip straight to page composition.
+    # Tiles are keyed by their sheet and card index plus every setting that
+    # changes the result, and the least recently used tiles are deleted once the
+    # folder grows over its size budget.
+    def __init__(self, folder, max_size_mb=TILE_CACHE_SIZE_MB):
+        self.folder = folder
+        self.max_bytes = int(max_size_mb) * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.current_bytes = sum(entry.stat().st_size for entry in self._entries())
+        if self.current_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        return [
+            entry
+            for entry in os.scandir(self.folder)
+            if entry.is_file() and entry.name.endswith(".png")
+        ]
+
+    def _path(self, source, image_height, dpi, sharpen_text):
+        key = repr((source, image_height, dpi, sharpen_text, TILE_CACHE_VERSION))
+        return os.path.join(
+            self.folder, hashlib.sha1(key.encode()).hexdigest() + ".png"
+        )
 
-    # Create a dictionary to store the extracted images
-    images = {}
+    def get(self, source, image_height, dpi, sharpen_text):
+        path = self._path(source, image_height, dpi, sharpen_text)
+        try:
+            tile = Image.open(path)
+            tile.load()
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        # Mark the tile as recently used and as already prepared
+        os.utime(path)
+        tile.info["sced_prepared"] = (image_height, sharpen_text)
+        return tile
+
+    def put(self, source, image_height, dpi, sharpen_text, tile):
+        buffer = io.BytesIO()
+        tile.save(buffer, "PNG")
+        path = self._path(source, image_height, dpi, sharpen_text)
+        write_file_atomic(path, buffer.getvalue())
+        with self._lock:
+            self.current_bytes += len(buffer.getvalue())
+        if self.current_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # Delete the least recently used tiles until we are within budget
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+            self.current_bytes = sum(entry.stat().st_size for entry in entries)
+            for entry in entries:
+                if self.current_bytes <= self.max_bytes:
+                    break
+                self.current_bytes -= entry.stat().st_size
+                os.remove(entry.path)
+
+    def log_stats(self):
+        logging.info(f"Tile cache: {self.hits} hits, {self.misses} misses")
+
+
+def create_tile_cache(args):
+    if not args.tile_cache:
+        return None
+    folder = args.tile_cache_path or (
+        os.path.normpath(args.cachepath) + TILE_CACHE_SUFFIX
+    )
+    return TileCache(folder, args.tile_cache_size)
+
+
+class RawSheetStore:
+    # Keeps every decoded deck sheet as an uncompressed NumPy array file beside
+    # the TTS image cache and memory-maps it, so cards are cut out as slices of
+    # the mapped file instead of from a decoded copy of the sheet in memory.
+    # Processes that map the same sheet share its pages through the OS page
+    # cache. The least recently used arrays are deleted once the folder grows
+    # over its size budget, and unmapped once the mapped arrays alone do, since
+    # a store shared by the jobs of the server would otherwise keep every sheet
+    # it ever mapped.
+    def __init__(self, folder, max_size_mb=RAW_SHEET_STORE_SIZE_MB):
+        self.folder = folder
+        self.max_bytes = int(max_size_mb) * 1024 * 1024
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.evict()
+
+    def _entries(self):
+        return [
+            entry
+            for entry in os.scandir(self.folder)
+            if entry.is_file() and entry.name.endswith(".npy")
+        ]
+
+    def _path(self, sheet_key, min_height):
+        size = "full" if min_height is None else str(min_height)
+        return os.path.join(self.folder, f"{sheet_key}_{size}.npy")
+
+    def get(
+        self, url, cache_folder="cache", stats=None, min_height=None, cache_index=None
+    ):
+        import numpy as np
+
+        path = self._path(sheet_key(url, cache_index), min_height)
+        with self._lock:
+            if path in self._arrays:
+                self._arrays.move_to_end(path)
+                return self._arrays[path]
+
+        # Decode the sheet again when the cached image is newer than its array
+        cache_file_path = locate_sheet(url, cache_folder, cache_index)
+        if (
+            not os.path.exists(path)
+            or cache_file_path is None
+            or os.path.getmtime(cache_file_path) > os.path.getmtime(path)
+        ):
+            img = load_sheet(url, cache_folder, stats, min_height, cache_index)
+
+            # Only keep modes that map directly onto an array of 8-bit channels
+            if img.mode not in ("L", "RGB", "RGBA"):
+                img = img.convert("RGBA")
+            fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, np.asarray(img))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            if stats is not None:
+                stats.count("raw_sheets_written")
+        else:
+            # Mark the array as recently used
+            os.utime(path)
+
+        array = np.load(path, mmap_mode="r")
+        with self._lock:
+            self._arrays[path] = array
+            self._arrays.move_to_end(path)
+
+            # Unmap the least recently used arrays, but never the one just
+            # mapped, until the mapped arrays fit in the budget
+            mapped_bytes = sum(mapped.nbytes for mapped in self._arrays.values())
+            while len(self._arrays) > 1 and mapped_bytes > self.max_bytes:
+                mapped_bytes -= self._arrays.popitem(last=False)[1].nbytes
+        self.evict()
+        return array
+
+    def evict(self):
+        # Delete the least recently used arrays that are not mapped until we
+        # are within budget
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+            current_bytes = sum(entry.stat().st_size for entry in entries)
+            for entry in entries:
+                if current_bytes <= self.max_bytes:
+                    break
+                if entry.path in self._arrays:
+                    continue
+                current_bytes -= entry.stat().st_size
+                os.remove(entry.path)
+
+
+def create_raw_sheet_store(args):
+    if not args.raw_sheet_store:
+        return None
+    folder = args.raw_sheet_store_path or (
+        os.path.normpath(args.cachepath) + RAW_SHEET_STORE_SUFFIX
+    )
+    return RawSheetStore(folder, args.raw_sheet_store_size)
+
+
+class CardIndex:
+    # Indexes the ArkhamDB card dump by card code in a sqlite file stored next to
+    # it, so that lookups are O(1) and the dump is only parsed again when it
+    # changes on disk.
+    def __init__(self, cards_json_path=CARDS_JSON_PATH):
+        self.cards_json_path = cards_json_path
+        self.index_path = cards_json_path + CARD_INDEX_SUFFIX
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._ensure_current()
+
+    @staticmethod
+    def _file_hash(path):
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _ensure_current(self):
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS cards "
+            "(code TEXT PRIMARY KEY, quantity INTEGER, pack_code TEXT)"
+        )
+        meta = dict(cursor.execute("SELECT key, value FROM meta"))
+
+        # Compare the stat of the dump first and only hash it when that changed
+        stat = os.stat(self.cards_json_path)
+        signature = f"{stat.st_mtime_ns}:{stat.st_size}"
+        if meta.get("signature") == signature:
+            return
+
+        source_hash = self._file_hash(self.cards_json_path)
+        if meta.get("source_hash") != source_hash:
+            logging.info(f"Building card index {self.index_path}")
+            with open(self.cards_json_path, "r") as f:
+                all_cards_data = json.load(f)
+            cursor.execute("DELETE FROM cards")
+            cursor.executemany(
+                "INSERT OR REPLACE INTO cards VALUES (?, ?, ?)",
+                (
+                    (item["code"], item.get("quantity"), item.get("pack_code"))
+                    for item in all_cards_data
+                ),
+            )
+
+        cursor.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [("signature", signature), ("source_hash", source_hash)],
+        )
+        self.connection.commit()
+
+    def get(self, code):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT quantity, pack_code FROM cards WHERE code = ?", (code,)
+            ).fetchone()
+        if row is None:
+            return None
+        card_data = {"code": code}
+        if row[0] is not None:
+            card_data["quantity"] = row[0]
+        if row[1] is not None:
+            card_data["pack_code"] = row[1]
+        return card_data
+
+
+def has_transparency(image):
+    if image.mode in ("RGBA", "LA", "PA"):
+        return image.getchannel("A").getextrema()[0] < 255
+    return "transparency" in image.info
+
+
+CardRef = namedtuple(
+    "CardRef", ["url", "card_index", "num_width", "num_height", "unique_back"]
+)
+
+
+class CardExtractor:
+    # Cuts the cards out of their sheets, or loads their finished tiles from the
+    # tile cache, and remembers which part of which sheet each card comes from
+    def __init__(
+        self,
+        args,
+        sheet_cache=None,
+        tile_cache=None,
+        stats=None,
+        raw_sheet_store=None,
+        cache_index=None,
+    ):
+        self.args = args
+        self.stats = stats if stats is not None else RunStats()
+        self.cache_index = cache_index
+
+        # Share decoded sheets between all cards cut from the same sheet
+        if sheet_cache is None:
+            sheet_cache = SheetCache(args.sheet_cache_size)
+        self.sheet_cache = sheet_cache
+
+        # Finished tiles from earlier runs skip extracting the card altogether
+        if tile_cache is None:
+            tile_cache = create_tile_cache(args)
+        self.tile_cache = tile_cache
+        self.image_height = get_card_and_page_size(args)[0][1]
+
+        # Cut the cards out of memory-mapped sheets when the raw sheet store is on
+        if raw_sheet_store is None:
+            raw_sheet_store = create_raw_sheet_store(args)
+        self.raw_sheet_store = raw_sheet_store
+
+        # Sheets only need to be decoded at a few times the size of the final tiles
+        self.min_card_height = None
+        if args.reduced_decode:
+            oversample = (
+                PREVIEW_OVERSAMPLE if args.preview else REDUCED_DECODE_OVERSAMPLE
+            )
+            self.min_card_height = math.ceil(self.image_height * oversample)
+
+    def extract(self, ref):
+        args = self.args
+
+        # Remember which part of which sheet the card comes from, and the size
+        # the sheet was decoded at
+        source = (sheet_key(ref.url, self.cache_index),)
+        if ref.unique_back:
+            source += (ref.card_index, ref.num_width, ref.num_height)
+        if self.min_card_height is not None:
+            source += (self.min_card_height,)
+
+        card = None
+        if self.tile_cache is not None:
+            card = self.tile_cache.get(
+                source, self.image_height, args.dpi, args.sharpen_text
+            )
+            self.stats.count("tile_cache_misses" if card is None else "tile_cache_hits")
+        if card is None:
+            card = extract_sced_card(
+                ref.url,
+                ref.card_index,
+                ref.num_width,
+                ref.num_height,
+                ref.unique_back,
+                args.cachepath,
+                self.sheet_cache,
+                self.stats,
+                self.min_card_height,
+                self.raw_sheet_store,
+                self.cache_index,
+            )
+            # Only cards that really have transparent pixels keep an alpha
+            # channel, the others are pasted onto the pages without a mask
+            with self.stats.stage("convert"):
+                card = card.convert("RGBA" if has_transparency(card) else "RGB")
+        card.info["sced_source"] = source
+        return card
+
+    def finish(self):
+        self.sheet_cache.log_stats()
+        if self.tile_cache is not None:
+            self.tile_cache.log_stats()
+        if self.cache_index is not None:
+            self.cache_index.evict()
+            self.cache_index.save()
+
+
+def card_key(ref, cache_index=None):
+    # Cards cut from the same place of the same sheet are the same card. Sheets
+    # are told apart by their content once they are cached and by their url
+    # before that, and shared backs are the whole sheet wherever they are used.
+    sheet = cache_index.content_hash(ref.url) if cache_index is not None else None
+    key = (sheet or normalize_url(ref.url),)
+    if ref.unique_back:
+        key += (ref.card_index, ref.num_width, ref.num_height)
+    return key
+
+
+def resolve_cards(args, result, card_index=None, cache_index=None):
+    # Decide which cards go into the PDF and which part of which sheet each one
+    # is cut from, without decoding any sheet. Every placement maps to the key
+    # and the sheet reference of its card, and all the placements of a card
+    # share its key, so the card is extracted, resized and sharpened once.
+    cards = {}
+
+    # Common backs are recognized by their normalized url or by their content,
+    # using the known digests and those of the urls found in the cache
+    def common_backs(urls, digests):
+        backs = {normalize_url(url) for url in urls} | set(digests)
+        if cache_index is not None:
+            backs |= {cache_index.content_hash(url) for url in urls} - {None}
+        return backs
+
+    def is_common_back(deck, backs):
+        for url in (deck["BackURL"], deck["FaceURL"]):
+            if normalize_url(url) in backs:
+                return True
+            if cache_index is not None and cache_index.content_hash(url) in backs:
+                return True
+        return False
+
+    common_encounter_backs = common_backs(
+        [COMMON_ENCOUNTER_BACK_URL], COMMON_ENCOUNTER_BACK_SHA256S
+    )
+    common_player_backs = common_backs(
+        COMMON_PLAYER_BACK_URLS, COMMON_PLAYER_BACK_SHA256S
+    )
 
-    # For each item in the dictionary, use extract_sced_card to extract the face and back cards
+    # For each item in the dictionary, find the sheets of the face and back cards
     for each in result.values():
         # Get the only key in the CustomDeck dictionary
         custom_deck_key = list(each["CustomDeck"])[0]
+        deck = each["CustomDeck"][custom_deck_key]
 
-        # Extract the face card
-        face_card = extract_sced_card(
-            each["CustomDeck"][custom_deck_key]["FaceURL"],
+        # The face card
+        face_ref = CardRef(
+            deck["FaceURL"],
             int(str(each["CardID"])[-2:]),
-            int(each["CustomDeck"][custom_deck_key]["NumWidth"]),
-            int(each["CustomDeck"][custom_deck_key]["NumHeight"]),
+            int(deck["NumWidth"]),
+            int(deck["NumHeight"]),
             True,
-            args.cachepath,
-        ).convert("RGBA")
-
-        if args.back:
-            # Extract the back card
-            back_card = extract_sced_card(
-                each["CustomDeck"][custom_deck_key]["BackURL"],
-                int(str(each["CardID"])[-2:]),
-                int(each["CustomDeck"][custom_deck_key]["NumWidth"]),
-                int(each["CustomDeck"][custom_deck_key]["NumHeight"]),
-                each["CustomDeck"][custom_deck_key]["UniqueBack"],
-                args.cachepath,
-            ).convert("RGBA")
+        )
+        face_card = (card_key(face_ref, cache_index), face_ref)
+
+        # The back card, which is the same for every card of the deck unless the
+        # backs are unique
+        back_ref = CardRef(
+            deck["BackURL"],
+            int(str(each["CardID"])[-2:]),
+            int(deck["NumWidth"]),
+            int(deck["NumHeight"]),
+            deck["UniqueBack"],
+        )
+        back_card = (card_key(back_ref, cache_index), back_ref)
 
         try:
             gmnotes = json.loads(each["GMNotes"])
@@ -414,10 +1957,12 @@ def extract_images(args):
         if args.card_quantity_source == "arkhamdb":
             # Using arkhamdb_id, get the quantity of the card using the ArkhamDB API
             if arkhamdb_id:
-                card_data = next(
-                    (item for item in all_cards_data if item["code"] == arkhamdb_id),
-                    None,
-                )
+                card_data = card_index.get(arkhamdb_id)
+                if card_data is None:
+                    logging.warning(
+                        f"Card {arkhamdb_id} was not found in the card index"
+                    )
+                    card_data = {}
                 quantity = card_data["quantity"] if "quantity" in card_data else 1
                 pack_code = card_data["pack_code"] if "pack_code" in card_data else None
             else:
@@ -425,84 +1970,509 @@ def extract_images(args):
                 pack_code = None
 
             for i in range(quantity):
-                images[f"{arkhamdb_id}_{i}"] = face_card
+                cards[f"{arkhamdb_id}_{i}"] = face_card
                 logging.info(
                     f"Added face card from the {pack_code} pack for {each['Nickname']}"
                 )
                 if args.back:
                     # Check if the card has a common back based on the url
                     if args.exclude_encounter_card_backs:
-                        if (
-                            each["CustomDeck"][custom_deck_key]["BackURL"]
-                            == COMMON_ENCOUNTER_BACK_URL
-                            or each["CustomDeck"][custom_deck_key]["BackURL"]
-                            == COMMON_ENCOUNTER_BACK_URL[:-1]
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            == COMMON_ENCOUNTER_BACK_URL
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            == COMMON_ENCOUNTER_BACK_URL[:-1]
-                        ):
+                        if is_common_back(deck, common_encounter_backs):
                             continue
 
                     if args.exclude_player_card_backs:
-                        if (
-                            each["CustomDeck"][custom_deck_key]["BackURL"]
-                            in COMMON_PLAYER_BACK_URLS
-                            or each["CustomDeck"][custom_deck_key]["BackURL"]
-                            in COMMON_PLAYER_BACK_URLS[:-1]
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            in COMMON_PLAYER_BACK_URLS
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            in COMMON_PLAYER_BACK_URLS[:-1]
-                        ):
+                        if is_common_back(deck, common_player_backs):
                             continue
-                    images[f"{arkhamdb_id}_{i}_back"] = back_card
+                    cards[f"{arkhamdb_id}_{i}_back"] = back_card
                     logging.info(
                         f"Added back card from the {pack_code} pack for {each['Nickname']}"
                     )
         elif args.card_quantity_source == "tts_saved_object":
             quantity = each["quantity"]
             for i in range(quantity):
-                images[f"{each['Nickname']}_{i}"] = face_card
+                cards[f"{each['Nickname']}_{i}"] = face_card
                 logging.info(f"Added face card for {each['Nickname']}")
                 if args.back:
                     # Check if the card has a common back based on the url
                     if args.exclude_encounter_card_backs:
-                        if (
-                            each["CustomDeck"][custom_deck_key]["BackURL"]
-                            == COMMON_ENCOUNTER_BACK_URL
-                            or each["CustomDeck"][custom_deck_key]["BackURL"]
-                            == COMMON_ENCOUNTER_BACK_URL[:-1]
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            == COMMON_ENCOUNTER_BACK_URL
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            == COMMON_ENCOUNTER_BACK_URL[:-1]
-                        ):
+                        if is_common_back(deck, common_encounter_backs):
                             continue
 
                     if args.exclude_player_card_backs:
-                        if (
-                            each["CustomDeck"][custom_deck_key]["BackURL"]
-                            in COMMON_PLAYER_BACK_URLS
-                            or each["CustomDeck"][custom_deck_key]["BackURL"]
-                            in COMMON_PLAYER_BACK_URLS[:-1]
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            in COMMON_PLAYER_BACK_URLS
-                            or each["CustomDeck"][custom_deck_key]["FaceURL"]
-                            in COMMON_PLAYER_BACK_URLS[:-1]
-                        ):
+                        if is_common_back(deck, common_player_backs):
                             continue
-                    images[f"{each['Nickname']}_{i}_back"] = back_card
+                    cards[f"{each['Nickname']}_{i}_back"] = back_card
                     logging.info(f"Added back card for {each['Nickname']}")
 
+    return cards
+
+
+def resolve_deck(
+    args,
+    sheet_cache=None,
+    card_index=None,
+    tile_cache=None,
+    stats=None,
+    raw_sheet_store=None,
+    cache_index=None,
+    prefetch=True,
+):
+    # Read the save and resolve its cards, returning them together with the
+    # extractor that cuts them
+    if args.card_quantity_source == "arkhamdb" and card_index is None:
+        card_index = CardIndex()
+    if stats is None:
+        stats = RunStats()
+
+    # Identify the cached sheets by their content
+    if cache_index is None:
+        cache_index = create_cache_index(args)
+
+    # Build the dictionary
+    result = {}
+    with stats.stage("parse"):
+        build_dict_from_file(args.filepath, result, args.stream_parse)
+    stats.count("cards_in_save", len(result))
+
+    # Download all uncached sheets concurrently before extracting the cards.
+    # Common backs are also recognized by their content, so their sheets have
+    # to be downloaded before the backs can be excluded.
+    excluding_backs = args.back and (
+        args.exclude_encounter_card_backs or args.exclude_player_card_backs
+    )
+    if prefetch or (excluding_backs and cache_index is not None):
+        prefetch_sheets(
+            collect_sheet_urls(result, args.back),
+            args.cachepath,
+            args.download_workers,
+            stats,
+            cache_index,
+        )
+
+    cards = resolve_cards(args, result, card_index, cache_index)
+    extractor = CardExtractor(
+        args, sheet_cache, tile_cache, stats, raw_sheet_store, cache_index
+    )
+    return cards, extractor
+
+
+def extract_images(
+    args,
+    sheet_cache=None,
+    card_index=None,
+    tile_cache=None,
+    stats=None,
+    raw_sheet_store=None,
+    cache_index=None,
+):
+    cards, extractor = resolve_deck(
+        args, sheet_cache, card_index, tile_cache, stats, raw_sheet_store, cache_index
+    )
+
+    # Create a dictionary to store the extracted images. Each card, such as a
+    # back shared by a whole deck, is cut once and the same image is placed
+    # everywhere it is used.
+    images = {}
+    extracted_cards = {}
+    for key, (card, ref) in cards.items():
+        if card not in extracted_cards:
+            extracted_cards[card] = extractor.extract(ref)
+        images[key] = extracted_cards[card]
+
+    extractor.finish()
     return images
 
 
-def arrange_images(images, args):
-    def convert_size_to_new_dpi(size, old_dpi, new_dpi):
-        ratio = new_dpi / old_dpi
-        return (int(size[0] * ratio), int(size[1] * ratio))
+def detect_text_regions(gray_images):
+    # Find the text boxes of several grayscale cards with a single Tesseract call
+    # by tiling them into one image, separated by white padding, and mapping
+    # each box back onto the cards it overlaps
+    import numpy as np
+    import pytesseract
+
+    columns = math.ceil(math.sqrt(len(gray_images)))
+    cell_width = max(gray.shape[1] for gray in gray_images) + OCR_BATCH_PADDING
+    cell_height = max(gray.shape[0] for gray in gray_images) + OCR_BATCH_PADDING
+    rows = math.ceil(len(gray_images) / columns)
+    mosaic = np.full((rows * cell_height, columns * cell_width), 255, np.uint8)
+    offsets = []
+    for i, gray in enumerate(gray_images):
+        top = (i // columns) * cell_height
+        left = (i % columns) * cell_width
+        mosaic[top : top + gray.shape[0], left : left + gray.shape[1]] = gray
+        offsets.append((left, top))
+
+    # Use Tesseract to detect text regions
+    data = pytesseract.image_to_data(mosaic, output_type=pytesseract.Output.DICT)
+    masks = [np.zeros(gray.shape, bool) for gray in gray_images]
+    for left, top, width, height in zip(
+        data["left"], data["top"], data["width"], data["height"]
+    ):
+        for mask, (x, y) in zip(masks, offsets):
+            # Clip the box to the card
+            x0 = max(left - x, 0)
+            y0 = max(top - y, 0)
+            x1 = min(left + width - x, mask.shape[1])
+            y1 = min(top + height - y, mask.shape[0])
+            if x0 < x1 and y0 < y1:
+                mask[y0:y1, x0:x1] = True
+    return masks
+
+
+def sharpen_text_regions(extracted_images):
+    import cv2
+    import numpy as np
+
+    # Convert PIL Images to OpenCV format
+    extracted_images_cv = [np.array(image) for image in extracted_images]
+
+    # Convert the images to grayscale and detect their text regions
+    masks = detect_text_regions(
+        [
+            cv2.cvtColor(
+                image,
+                cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY,
+            )
+            for image in extracted_images_cv
+        ]
+    )
+
+    sharpened_images = []
+    for extracted_image_cv, mask in zip(extracted_images_cv, masks):
+        # Sharpen the entire image, reusing the blurred buffer for the result
+        sharpened = cv2.GaussianBlur(extracted_image_cv, (3, 3), 0)
+        cv2.addWeighted(extracted_image_cv, 2.0, sharpened, -1.0, 0, dst=sharpened)
+
+        # Apply sharpening to only the text regions, in place
+        np.copyto(extracted_image_cv, sharpened, where=mask[..., None])
+
+        # Convert the image back to PIL Image format
+        sharpened_images.append(Image.fromarray(extracted_image_cv))
+    return sharpened_images
+
+
+def prepare_card_batch(extracted_images, image_height, sharpen_text=False, stats=None):
+    if stats is None:
+        stats = RunStats()
+
+    prepared_images = []
+    for extracted_image in extracted_images:
+        # Resize the image based on height while maintaining aspect ratio
+        width, height = extracted_image.size
+        new_height = image_height
+        new_width = int((new_height / height) * width)
+        with stats.stage("resize"):
+            prepared_images.append(
+                extracted_image.resize((new_width, new_height), Image.LANCZOS)
+            )
+
+    if sharpen_text:  # Sharpen the images if the checkbox is checked
+        sharpened_images = []
+        for i in range(0, len(prepared_images), OCR_BATCH_SIZE):
+            with stats.stage("sharpen"):
+                sharpened_images += sharpen_text_regions(
+                    prepared_images[i : i + OCR_BATCH_SIZE]
+                )
+        for prepared_image, sharpened_image in zip(prepared_images, sharpened_images):
+            sharpened_image.info = prepared_image.info
+        prepared_images = sharpened_images
+
+    return prepared_images
+
+
+def prepare_card(extracted_image, image_height, sharpen_text=False):
+    return prepare_card_batch([extracted_image], image_height, sharpen_text)[0]
+
+
+def prepare_card_batch_with_stats(extracted_images, image_height, sharpen_text):
+    # Worker processes send their stats back along with the prepared cards
+    stats = RunStats()
+    prepared_images = prepare_card_batch(
+        extracted_images, image_height, sharpen_text, stats
+    )
+    return prepared_images, stats
+
+
+def store_prepared_tile(tile_cache, extracted_image, prepared_image, dpi):
+    # Tiles can only be cached for cards whose sheet is known
+    source = extracted_image.info.get("sced_source")
+    if tile_cache is None or source is None:
+        return
+    image_height, sharpen_text = prepared_image.info["sced_prepared"]
+    tile_cache.put(source, image_height, dpi, sharpen_text, prepared_image)
+
+
+def is_prepared(extracted_image, image_height, sharpen_text):
+    # Tiles loaded from the tile cache are already resized and sharpened
+    return extracted_image.info.get("sced_prepared") == (image_height, sharpen_text)
+
+
+def prepare_card_cached(
+    prepared_cards,
+    extracted_image,
+    image_height,
+    sharpen_text,
+    tile_cache=None,
+    dpi=None,
+):
+    # The source image is kept in the entry so its id can't be reused by another
+    # image while the entry exists
+    key = (id(extracted_image), image_height, sharpen_text)
+    if key not in prepared_cards:
+        if is_prepared(extracted_image, image_height, sharpen_text):
+            prepared_image = extracted_image
+        else:
+            prepared_image = prepare_card(extracted_image, image_height, sharpen_text)
+            prepared_image.info["sced_prepared"] = (image_height, sharpen_text)
+            store_prepared_tile(tile_cache, extracted_image, prepared_image, dpi)
+        prepared_cards[key] = (extracted_image, prepared_image)
+    return prepared_cards[key][1]
+
+
+def prepare_cards(
+    prepared_cards,
+    source_images,
+    image_height,
+    sharpen_text,
+    workers,
+    tile_cache=None,
+    dpi=None,
+    stats=None,
+    executor=None,
+):
+    # Prepare every card that is not cached yet in batches, on a pool of worker
+    # processes when there is more than one batch. Results are stored under the
+    # same keys prepare_card_cached uses, so the layout loop picks them up in
+    # its usual order. A running pool can be passed in to reuse its processes.
+    if stats is None:
+        stats = RunStats()
+    pending = {}
+    for extracted_image in source_images:
+        key = (id(extracted_image), image_height, sharpen_text)
+        if key in prepared_cards or is_prepared(
+            extracted_image, image_height, sharpen_text
+        ):
+            continue
+
+        # Cards extracted for several output targets may have tiles cached for
+        # this one already
+        source = extracted_image.info.get("sced_source")
+        if tile_cache is not None and source is not None:
+            tile = tile_cache.get(source, image_height, dpi, sharpen_text)
+            if tile is not None:
+                stats.count("tile_cache_hits")
+                prepared_cards[key] = (extracted_image, tile)
+                continue
+        pending[key] = extracted_image
+    if not pending:
+        return
+    stats.count("cards_prepared", len(pending))
+
+    # When sharpening, the cards of a batch share Tesseract calls, so batches
+    # are as large as possible while still keeping every worker busy
+    if sharpen_text:
+        batch_size = min(OCR_BATCH_SIZE, math.ceil(len(pending) / max(workers, 1)))
+    else:
+        batch_size = max(1, len(pending) // (max(workers, 1) * 4))
+    pending_images = list(pending.values())
+    batches = [
+        pending_images[i : i + batch_size]
+        for i in range(0, len(pending_images), batch_size)
+    ]
+
+    if workers > 1 and len(batches) > 1:
+        logging.info(f"Preparing {len(pending)} cards on {workers} worker processes")
+        if executor is None:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool = nullcontext(executor)
+        with pool as executor:
+            results = []
+            for batch_images, batch_stats in executor.map(
+                prepare_card_batch_with_stats,
+                batches,
+                repeat(image_height),
+                repeat(sharpen_text),
+            ):
+                results.append(batch_images)
+                stats.merge(batch_stats)
+    else:
+        results = [
+            prepare_card_batch(batch, image_height, sharpen_text, stats)
+            for batch in batches
+        ]
+
+    prepared_images = [image for batch in results for image in batch]
+    for (key, extracted_image), prepared_image in zip(pending.items(), prepared_images):
+        prepared_image.info["sced_prepared"] = (image_height, sharpen_text)
+        with stats.stage("store_tile"):
+            store_prepared_tile(tile_cache, extracted_image, prepared_image, dpi)
+        prepared_cards[key] = (extracted_image, prepared_image)
+
+
+class PdfWriter:
+    # Writes a PDF one page at a time. Each page is encoded and flushed to disk as
+    # soon as it is added, so only the page being composed has to be in memory.
+    # The pages go to a temporary file that only replaces the PDF once it is
+    # complete, so a failed run leaves the previous PDF in place.
+    def __init__(self, path, dpi):
+        self.path = path
+        self.dpi = dpi
+        fd, self.temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", suffix=".tmp"
+        )
+        self.file = os.fdopen(fd, "wb")
+        self.offsets = {}
+        self.page_refs = []
+
+        # Object 1 is the catalog and object 2 the page tree, both written last
+        self.next_object = 3
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def discard(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.temp_path)
+
+    def _write_object(self, number, dictionary, stream=None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(f"{number} 0 obj\n".encode())
+        if stream is None:
+            self.file.write(f"{dictionary}\n".encode())
+        else:
+            self.file.write(f"{dictionary[:-2]} /Length {len(stream)} >>\n".encode())
+            self.file.write(b"stream\n")
+            self.file.write(stream)
+            self.file.write(b"\nendstream\n")
+        self.file.write(b"endobj\n")
+
+    def _allocate(self):
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    @staticmethod
+    def encode_jpeg(image):
+        # Encode RGB pixels as JPEG, the same way Pillow's PDF plugin does
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, "JPEG")
+        return buffer.getvalue()
+
+    def _add_jpeg(self, encoded_image, size, soft_mask=""):
+        number = self._allocate()
+        self._write_object(
+            number,
+            f"<< /Type /XObject /Subtype /Image /Width {size[0]} "
+            f"/Height {size[1]} /ColorSpace /DeviceRGB "
+            f"/BitsPerComponent 8 /Filter /DCTDecode{soft_mask} >>",
+            encoded_image,
+        )
+        return number
+
+    def add_image(self, image):
+        soft_mask = ""
+
+        # Keep any transparency as a losslessly compressed soft mask
+        if image.mode == "RGBA" and image.getchannel("A").getextrema() != (255, 255):
+            mask_number = self._allocate()
+            self._write_object(
+                mask_number,
+                f"<< /Type /XObject /Subtype /Image /Width {image.width} "
+                f"/Height {image.height} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 8 /Filter /FlateDecode >>",
+                zlib.compress(image.getchannel("A").tobytes()),
+            )
+            soft_mask = f" /SMask {mask_number} 0 R"
+
+        return self._add_jpeg(self.encode_jpeg(image), image.size, soft_mask)
+
+    def _to_points(self, pixels):
+        return pixels * 72.0 / self.dpi
+
+    def add_placements(self, page_size, placements):
+        # Each placement is (image number, (x, y), (width, height)) in pixels,
+        # measured from the top left corner of the page
+        page_width = self._to_points(page_size[0])
+        page_height = self._to_points(page_size[1])
+
+        content = []
+        resources = {}
+        for image_number, position, size in placements:
+            name = f"Im{image_number}"
+            resources[name] = image_number
+            width = self._to_points(size[0])
+            height = self._to_points(size[1])
+            x = self._to_points(position[0])
+            y = page_height - self._to_points(position[1]) - height
+            content.append(
+                f"q {width:.4f} 0 0 {height:.4f} {x:.4f} {y:.4f} cm /{name} Do Q"
+            )
+
+        content_number = self._allocate()
+        self._write_object(content_number, "<< >>", "\n".join(content).encode())
+
+        xobjects = " ".join(
+            f"/{name} {number} 0 R" for name, number in resources.items()
+        )
+        page_number = self._allocate()
+        self._write_object(
+            page_number,
+            f"<< /Type /Page /Parent 2 0 R "
+            f"/Resources << /XObject << {xobjects} >> >> "
+            f"/MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+            f"/Contents {content_number} 0 R >>",
+        )
+        self.page_refs.append(page_number)
+        self.file.flush()
+
+    def add_page(self, page):
+        self.add_encoded_page(self.encode_jpeg(page), page.size)
+
+    def add_encoded_page(self, encoded_page, page_size):
+        # Add a page that consists of a single JPEG encoded image
+        image_number = self._add_jpeg(encoded_page, page_size)
+        self.add_placements(page_size, [(image_number, (0, 0), page_size)])
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        kids = " ".join(f"{number} 0 R" for number in self.page_refs)
+        self._write_object(
+            2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_refs)} >>"
+        )
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        # Write the cross-reference table and the trailer
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_object}\n".encode())
+        self.file.write(b"0000000000 65535 f \n")
+        for number in range(1, self.next_object):
+            self.file.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self.file.write(
+            f"trailer\n<< /Size {self.next_object} /Root 1 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
 
+def convert_size_to_new_dpi(size, old_dpi, new_dpi):
+    ratio = new_dpi / old_dpi
+    return (int(size[0] * ratio), int(size[1] * ratio))
+
+
+def get_card_and_page_size(args):
     dpi = args.dpi
     converted_card_sizes = {
         key: convert_size_to_new_dpi(value, 300, dpi)
@@ -521,11 +2491,28 @@ def arrange_images(images, args):
     else:
         image_size = converted_card_sizes["standard"]
 
-    page_size = converted_sheet_sizes[args.sheet_size]
+    return image_size, converted_sheet_sizes[args.sheet_size]
+
+
+PageLayout = namedtuple(
+    "PageLayout",
+    [
+        "page_size",
+        "image_size",
+        "margin_size",
+        "images_per_row",
+        "images_per_page",
+        "start_x",
+        "start_y",
+    ],
+)
+
+
+def compute_page_layout(first_image, args):
+    image_size, page_size = get_card_and_page_size(args)
     margin_size = int(args.margin_size)
 
     # Calculate new width of first image based on the new height while maintaining aspect ratio
-    first_image = list(images.values())[0]
     width, height = first_image.size
     new_height = image_size[1]
     new_width = int((new_height / height) * width)
@@ -546,128 +2533,922 @@ def arrange_images(images, args):
     start_x = (page_size[0] - total_width) // 2
     start_y = (page_size[1] - total_height) // 2
 
+    return PageLayout(
+        page_size,
+        image_size,
+        margin_size,
+        images_per_row,
+        images_per_page,
+        start_x,
+        start_y,
+    )
+
+
+def slot_position(layout, slot):
+    # Images fill each row from left to right, then the rows from top to bottom
+    row, column = divmod(slot, layout.images_per_row)
+    return (
+        layout.start_x + column * (layout.image_size[0] + layout.margin_size),
+        layout.start_y + row * (layout.image_size[1] + layout.margin_size),
+    )
+
+
+def compose_page(layout, page_images):
     # Create a new blank page with white background
-    current_page = Image.new("RGB", page_size, (255, 255, 255))
+    page = Image.new("RGB", layout.page_size, (255, 255, 255))
+
+    # Paste the images onto the page, blending only the ones with transparency
+    for slot, image in enumerate(page_images):
+        mask = image if image.mode == "RGBA" else None
+        page.paste(image, slot_position(layout, slot), mask=mask)
+    return page
+
+
+def compose_encoded_page(layout, page_images):
+    # Worker processes send their stats back along with the encoded page
+    stats = RunStats()
+    with stats.stage("compose"):
+        page = compose_page(layout, page_images)
+    with stats.stage("encode"):
+        encoded_page = PdfWriter.encode_jpeg(page)
+    return encoded_page, stats
+
+
+def iter_encoded_pages(layout, pages, workers=1, executor=None):
+    # Compose and encode the pages on a pool of worker processes, yielding them
+    # in their original order. At most two pages per worker are in flight, so
+    # the pages waiting to be written don't pile up in memory.
+    if workers <= 1:
+        for page_images in pages:
+            yield compose_encoded_page(layout, page_images)
+        return
+
+    if executor is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = nullcontext(executor)
+    with pool as executor:
+        pending = deque()
+        for page_images in pages:
+            pending.append(executor.submit(compose_encoded_page, layout, page_images))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def card_identity(image):
+    # Cards cut from a known sheet are identified by their source, anything
+    # else by its pixels
+    source = image.info.get("sced_source")
+    if source is not None:
+        return source
+    return hashlib.sha1(image.tobytes()).hexdigest()
+
+
+def page_hash(layout, args, page_images):
+    digest = hashlib.sha256(
+        repr((tuple(layout), args.dpi, args.sharpen_text, TILE_CACHE_VERSION)).encode()
+    )
+    for image in page_images:
+        digest.update(repr(card_identity(image)).encode())
+    return digest.hexdigest()
+
+
+class PageStore:
+    # Keeps the encoded pages of the last run next to the PDF, with a record of
+    # the cards and the hash of each page, so that an incremental run only
+    # composes the pages whose contents changed.
+    def __init__(self, pdf_path):
+        base_path = os.path.splitext(pdf_path)[0]
+        self.folder = base_path + "_pages"
+        self.record_path = base_path + "_pages.json"
+        self.recorded_hashes = set()
+        if os.path.exists(self.record_path):
+            with open(self.record_path, "r") as f:
+                self.recorded_hashes = {page["hash"] for page in json.load(f)["pages"]}
+
+    def _path(self, page_hash):
+        return os.path.join(self.folder, page_hash + ".jpg")
+
+    def get(self, page_hash):
+        if page_hash not in self.recorded_hashes:
+            return None
+        try:
+            with open(self._path(page_hash), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, page_hash, encoded_page):
+        write_file_atomic(self._path(page_hash), encoded_page)
+
+    def save_record(self, page_keys, page_hashes):
+        pages = [
+            {"keys": keys, "hash": page_hash}
+            for keys, page_hash in zip(page_keys, page_hashes)
+        ]
+        with open(self.record_path, "w") as f:
+            json.dump({"pages": pages}, f, indent=2)
+
+        # Remove the pages that are no longer part of the PDF
+        for entry in os.scandir(self.folder):
+            if entry.name[: -len(".jpg")] not in page_hashes:
+                os.remove(entry.path)
+
+
+def arrange_images(images, args, prepared_cards=None, tile_cache=None, stats=None):
+    if stats is None:
+        stats = RunStats()
+    dpi = args.dpi
+    layout = compute_page_layout(list(images.values())[0], args)
+    image_height = layout.image_size[1]
+
+    # Split the cards into pages
+    keys = sorted(images.keys())
+    page_keys = [
+        keys[i : i + layout.images_per_page]
+        for i in range(0, len(keys), layout.images_per_page)
+    ]
+
+    # In incremental mode, pages that are unchanged since the last run are
+    # copied from the page store instead of being composed again
+    page_store = None
+    page_hashes = [None] * len(page_keys)
+    if args.incremental and not args.unique_card_images:
+        page_store = PageStore(args.output)
+        page_hashes = [
+            page_hash(layout, args, [images[key] for key in keys]) for keys in page_keys
+        ]
+    stored_pages = [
+        page_store.get(hash_) if page_store is not None else None
+        for hash_ in page_hashes
+    ]
+
+    # Copies of a card share the same image object, so each one is only
+    # resized and sharpened once
+    if prepared_cards is None:
+        prepared_cards = {}
+    if tile_cache is None:
+        tile_cache = create_tile_cache(args)
+    with stats.stage("prepare"):
+        prepare_cards(
+            prepared_cards,
+            [
+                images[key]
+                for keys, stored_page in zip(page_keys, stored_pages)
+                if stored_page is None
+                for key in keys
+            ],
+            image_height,
+            args.sharpen_text,
+            args.workers,
+            tile_cache,
+            dpi,
+            stats,
+        )
 
-    # Keep track of the current position on the page
-    current_position = [start_x, start_y]
+    # When embedding each unique card once, pages only reference the card images
+    card_image_numbers = {}
+
+    def page_images(keys):
+        return [
+            prepare_card_cached(
+                prepared_cards,
+                images[key],
+                image_height,
+                args.sharpen_text,
+                tile_cache,
+                dpi,
+            )
+            for key in keys
+        ]
+
+    # Otherwise every page is a single image, and the pages are composed and
+    # encoded in parallel ahead of being written
+    if not args.unique_card_images:
+        composed_keys = [
+            keys
+            for keys, stored_page in zip(page_keys, stored_pages)
+            if stored_page is None
+        ]
+        encoded_pages = iter_encoded_pages(
+            layout,
+            (page_images(keys) for keys in composed_keys),
+            min(args.workers, len(composed_keys)),
+        )
 
-    # Keep track of the number of images on the current page
-    image_count = 0
+    # Pages are written to the PDF file as soon as they are done. The file is
+    # finished even when a page fails, so it is never left open.
+    with PdfWriter(args.output, dpi) as pdf_writer:
+        for page_index, keys in enumerate(page_keys):
+            stats.count("pages")
+            if stored_pages[page_index] is not None:
+                with stats.stage("write"):
+                    pdf_writer.add_encoded_page(
+                        stored_pages[page_index], layout.page_size
+                    )
+                stats.count("pages_reused")
+                logging.info(f"Reused page {page_index + 1}")
+                continue
+
+            if args.unique_card_images:
+                # Embed each prepared card only once and reference it from the pages
+                placements = []
+                for slot, image in enumerate(page_images(keys)):
+                    if id(image) not in card_image_numbers:
+                        with stats.stage("write"):
+                            card_image_numbers[id(image)] = pdf_writer.add_image(image)
+                    placements.append(
+                        (
+                            card_image_numbers[id(image)],
+                            slot_position(layout, slot),
+                            image.size,
+                        )
+                    )
+                with stats.stage("write"):
+                    pdf_writer.add_placements(layout.page_size, placements)
+            else:
+                encoded_page, page_stats = next(encoded_pages)
+                stats.merge(page_stats)
+                with stats.stage("write"):
+                    pdf_writer.add_encoded_page(encoded_page, layout.page_size)
+                    if page_store is not None:
+                        page_store.put(page_hashes[page_index], encoded_page)
+            logging.info(f"Created page {page_index + 1}")
+
+        # Finish the PDF file
+        with stats.stage("write"):
+            pdf_writer.close()
+    if page_store is not None:
+        page_store.save_record(page_keys, page_hashes)
 
-    # Create a list to store the pages
-    pages = []
+    logging.info("PDF file created")
 
-    for key in sorted(images.keys()):
-        extracted_image = images[key]
 
-        # Resize the image based on height while maintaining aspect ratio
-        width, height = extracted_image.size
-        new_height = image_size[1]
-        new_width = int((new_height / height) * width)
-        extracted_image = extracted_image.resize((new_width, new_height), Image.LANCZOS)
-
-        if args.sharpen_text:  # Sharpen the image if the checkbox is checked
-
-            # Convert PIL Image to OpenCV format
-            extracted_image_cv = np.array(extracted_image)
-
-            # Convert the image to grayscale
-            gray = cv2.cvtColor(extracted_image_cv, cv2.COLOR_BGR2GRAY)
-
-            # Use Tesseract to detect text regions
-            data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
-            n_boxes = len(data["level"])
-            mask = np.zeros_like(extracted_image_cv)
-            for i in range(n_boxes):
-                (x, y, w, h) = (
-                    data["left"][i],
-                    data["top"][i],
-                    data["width"][i],
-                    data["height"][i],
+def iter_in_background(items, depth=PIPELINE_DEPTH):
+    # Run a generator on its own thread, handing its items over through a queue
+    # of limited depth so that it can only work a few items ahead. Errors are
+    # raised in the consumer, and the thread stops when the consumer does.
+    handover = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    finished = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                handover.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((finished, None))
+        except Exception as e:
+            put((None, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = handover.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def stream_images(cards, extractor, args):
+    # Render the PDF as a pipeline: the sheets are downloaded in the order the
+    # pages need them, while the cards of the earlier pages are cut and prepared
+    # on one thread, and the finished pages are composed, encoded and written
+    # as they arrive. The stages hand the pages over through queues of limited
+    # depth, and each card is released as soon as no later page uses it, so
+    # only a few pages worth of cards are in memory at any time.
+    stats = extractor.stats
+    dpi = args.dpi
+    keys = sorted(cards)
+    remaining_uses = {}
+    for key in keys:
+        card = cards[key][0]
+        remaining_uses[card] = remaining_uses.get(card, 0) + 1
+
+    # Queue the uncached sheets for download in the order they are first used
+    session = create_download_session(args.download_workers)
+    downloader = ThreadPoolExecutor(max_workers=args.download_workers)
+    downloads = {}
+    checked_urls = set()
+    for key in keys:
+        url = cards[key][1].url
+        if normalize_url(url) in checked_urls:
+            continue
+        checked_urls.add(normalize_url(url))
+        if not locate_sheet(url, args.cachepath, extractor.cache_index):
+            downloads[normalize_url(url)] = downloader.submit(
+                download_sheet,
+                session,
+                url,
+                args.cachepath,
+                stats,
+                extractor.cache_index,
+            )
+    if downloads:
+        logging.info(f"Downloading {len(downloads)} uncached sheets...")
+
+    extracted_cards = {}
+
+    def extract(card, ref):
+        if card not in extracted_cards:
+            # Wait for the sheet of the card if it is still being downloaded
+            download = downloads.pop(normalize_url(ref.url), None)
+            if download is not None:
+                try:
+                    download.result()
+                    logging.info(f"Downloaded sheet {ref.url}")
+                except Exception as e:
+                    # The sheet is fetched again when the card is extracted
+                    logging.warning(f"Failed to download sheet {ref.url}: {e}")
+            with stats.stage("extract"):
+                extracted_cards[card] = extractor.extract(ref)
+        return extracted_cards[card]
+
+    # The page layout follows the shape of the first card
+    layout = compute_page_layout(extract(*next(iter(cards.values()))), args)
+    image_height = layout.image_size[1]
+    page_keys = [
+        keys[i : i + layout.images_per_page]
+        for i in range(0, len(keys), layout.images_per_page)
+    ]
+    workers = max(1, min(args.workers, len(page_keys)))
+    prepared_cards = {}
+
+    def prepared_pages(executor):
+        for keys in page_keys:
+            page_cards = [cards[key] for key in keys]
+            source_images = [extract(card, ref) for card, ref in page_cards]
+            with stats.stage("prepare"):
+                prepare_cards(
+                    prepared_cards,
+                    source_images,
+                    image_height,
+                    args.sharpen_text,
+                    workers,
+                    extractor.tile_cache,
+                    dpi,
+                    stats,
+                    executor,
                 )
-                mask[y : y + h, x : x + w] = 1
+                page_images = [
+                    prepare_card_cached(
+                        prepared_cards,
+                        image,
+                        image_height,
+                        args.sharpen_text,
+                        extractor.tile_cache,
+                        dpi,
+                    )
+                    for image in source_images
+                ]
+
+            # Forget the cards that no later page uses
+            for card, _ in page_cards:
+                remaining_uses[card] -= 1
+                if not remaining_uses[card]:
+                    image = extracted_cards.pop(card)
+                    prepared_cards.pop((id(image), image_height, args.sharpen_text))
+            yield page_images
+
+    # Cards are prepared and pages composed on the same pool of processes
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = nullcontext()
+    try:
+        with pool as executor, PdfWriter(args.output, dpi) as pdf_writer:
+            encoded_pages = iter_encoded_pages(
+                layout,
+                iter_in_background(prepared_pages(executor)),
+                workers,
+                executor,
+            )
+            for page_number, (encoded_page, page_stats) in enumerate(
+                encoded_pages, start=1
+            ):
+                stats.count("pages")
+                stats.merge(page_stats)
+                with stats.stage("write"):
+                    pdf_writer.add_encoded_page(encoded_page, layout.page_size)
+                logging.info(f"Created page {page_number}")
+    finally:
+        downloader.shutdown(cancel_futures=True)
+        session.close()
+    extractor.finish()
 
-            # Sharpen the entire image
-            blurred = cv2.GaussianBlur(extracted_image_cv, (3, 3), 0)
-            sharpened = cv2.addWeighted(extracted_image_cv, 2.0, blurred, -1.0, 0)
+    logging.info("PDF file created")
 
-            # Apply sharpening to only the text regions
-            extracted_image_cv = extracted_image_cv * (1 - mask) + sharpened * mask
 
-            # Convert the image back to PIL Image format
-            extracted_image = Image.fromarray(extracted_image_cv)
+def manifest_path(pdf_path):
+    return os.path.splitext(pdf_path)[0] + "_manifest.csv"
 
-        # Paste the image onto the current page
-        current_page.paste(
-            extracted_image, tuple(current_position), mask=extracted_image
-        )
 
-        # Update the image count
-        image_count += 1
+def report_path(pdf_path):
+    return os.path.splitext(pdf_path)[0] + "_report.json"
 
-        # Update the current position
-        current_position[0] += image_size[0] + margin_size
-        if current_position[0] >= start_x + total_width:
-            current_position[0] = start_x
-            current_position[1] += image_size[1] + margin_size
 
-        # If the current page is full or there are no more images, add it to the list of pages
-        if (
-            image_count != 0
-            and image_count % images_per_page == 0
-            and image_count != len(images)
-        ):
-            current_page.info["dpi"] = (dpi, dpi)
-            pages.append(current_page)
-            logging.info(f"Created page {len(pages)}")
+def profile_path(pdf_path):
+    return os.path.splitext(pdf_path)[0] + "_profile.prof"
+
 
-            # Reset the current page and position for the next page
-            current_page = Image.new("RGB", page_size, "white")
-            current_position = [start_x, start_y]
+def trace_memory_report(snapshot):
+    # Summarize the peak memory use and the lines that allocated the most
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    return {
+        "current_bytes": current_bytes,
+        "peak_bytes": peak_bytes,
+        "top_allocations": [
+            {"location": str(statistic.traceback), "bytes": statistic.size}
+            for statistic in snapshot.statistics("lineno")[:TRACE_MEMORY_TOP_SITES]
+        ],
+    }
 
-    # # Save the last page if it's not empty or if it is full
-    if image_count % images_per_page != 0 or image_count == len(images):
-        current_page.info["dpi"] = (dpi, dpi)
-        pages.append(current_page)
-        logging.info(f"Created page {len(pages)}")
 
-    # Save all pages into a single PDF file
-    pages[0].save(
-        "tts_extract_out.pdf",
-        "PDF",
-        resolution=dpi,
-        save_all=True,
-        append_images=pages[1:],
+def target_args(args, target):
+    # Apply the settings of an output target on top of the deck options
+    target_args = argparse.Namespace(**vars(args))
+    if "sheet" in target:
+        target_args.sheet_size = target["sheet"]
+    if target.get("card") in CARD_SIZES:
+        target_args.image_size = target["card"]
+        target_args.custom_image_size = None
+    elif "card" in target:
+        target_args.custom_image_size = tuple(int(x) for x in target["card"].split("x"))
+    if "dpi" in target:
+        target_args.dpi = int(target["dpi"])
+    if "margin" in target:
+        target_args.margin_size = int(target["margin"])
+    if "sharpen" in target:
+        target_args.sharpen_text = target["sharpen"].lower() in ("1", "true")
+
+    # Name the PDF after the deck and the target unless it is given
+    if "output" in target:
+        target_args.output = target["output"]
+    else:
+        if target_args.custom_image_size:
+            card = "x".join(str(x) for x in target_args.custom_image_size)
+        else:
+            card = target_args.image_size
+        suffix = (
+            f"_{target_args.sheet_size}_{card}_{target_args.dpi}dpi"
+            f"_{target_args.margin_size}margin"
+        )
+        if target_args.sharpen_text:
+            suffix += "_sharpened"
+        target_args.output = os.path.splitext(args.output)[0] + suffix + ".pdf"
+    return target_args
+
+
+def resolve_targets(args):
+    # Every target needs a PDF of its own, or the later ones would overwrite it
+    if not args.targets:
+        return [args]
+    targets = [target_args(args, target) for target in args.targets]
+    outputs = set()
+    for target in targets:
+        output = os.path.abspath(target.output)
+        if output in outputs:
+            raise ValueError(f"several targets are written to {target.output}")
+        outputs.add(output)
+    return targets
+
+
+def render_deck(
+    args,
+    sheet_cache=None,
+    card_index=None,
+    tile_cache=None,
+    raw_sheet_store=None,
+    cache_index=None,
+):
+    # A preview trades resolution for speed
+    if args.preview:
+        args.dpi = PREVIEW_DPI
+
+    # Every output target is rendered from the same extracted cards
+    targets = [args]
+    extract_args = args
+    extract_tile_cache = tile_cache
+    if args.targets:
+        targets = resolve_targets(args)
+
+        # Cut the cards at the largest size any of the targets needs, and
+        # leave the finished tiles of each target to the layout step
+        extract_args = argparse.Namespace(
+            **vars(
+                max(
+                    targets,
+                    key=lambda target: get_card_and_page_size(target)[0][1],
+                )
+            )
+        )
+        extract_args.tile_cache = False
+        extract_tile_cache = None
+
+    stats = RunStats()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    # A single PDF written from scratch is rendered as a pipeline, the other
+    # modes need all the cards before the first page
+    pipelined = args.pipeline and not (
+        args.targets or args.incremental or args.unique_card_images
     )
 
-    logging.info("PDF file created")
+    # Extract the images
+    logging.info(f"Extracting images from {args.filepath}...")
+    with stats.stage("extract"):
+        if pipelined:
+            images, extractor = resolve_deck(
+                args,
+                sheet_cache,
+                card_index,
+                tile_cache,
+                stats,
+                raw_sheet_store,
+                cache_index,
+                prefetch=False,
+            )
+        else:
+            images = extract_images(
+                extract_args,
+                sheet_cache,
+                card_index,
+                extract_tile_cache,
+                stats,
+                raw_sheet_store,
+                cache_index,
+            )
+    if not images:
+        if args.trace_memory:
+            tracemalloc.stop()
+        if profiler is not None:
+            profiler.disable()
+        raise ValueError(f"no cards found in {args.filepath}")
+    logging.info("Successfully extracted images")
+
+    # Targets with the same card height and sharpening share the prepared cards
+    prepared_cards = {}
+    for target in targets:
+        # Write a csv containing the keys of the images dictionary
+        with open(manifest_path(target.output), "w") as f:
+            f.write("image_id\n")
+            for key in images.keys():
+                f.write(f"{key}\n")
+
+        # Arrange the images into a single pdf
+        with stats.stage("arrange"):
+            if pipelined:
+                stream_images(images, extractor, args)
+            else:
+                arrange_images(images, target, prepared_cards, tile_cache, stats)
+
+    memory = None
+    if args.trace_memory:
+        memory = trace_memory_report(tracemalloc.take_snapshot())
+        tracemalloc.stop()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile_path(args.output))
+        profile_summary = io.StringIO()
+        pstats.Stats(profiler, stream=profile_summary).sort_stats(
+            "cumulative"
+        ).print_stats(PROFILE_TOP_FUNCTIONS)
+        logging.info(profile_summary.getvalue())
+
+    # Summarize where the time went
+    stats.log_summary()
+    if args.report:
+        for target in targets:
+            report = stats.report(
+                filepath=args.filepath,
+                output=target.output,
+                outputs=[target.output for target in targets],
+                placements=len(images),
+                dpi=target.dpi,
+                sharpen_text=target.sharpen_text,
+                workers=args.workers,
+            )
+            if memory is not None:
+                report["memory"] = memory
+            with open(report_path(target.output), "w") as f:
+                json.dump(report, f, indent=2)
+
+    return [target.output for target in targets]
+
+
+class RenderJobs:
+    # Queues the render jobs submitted to the local server and runs them on a
+    # few threads. The decoded sheets, the card index and the card tiles are
+    # shared by every job, so they stay warm from one job to the next.
+    def __init__(
+        self,
+        args,
+        sheet_cache,
+        card_index=None,
+        tile_cache=None,
+        raw_sheet_store=None,
+        cache_index=None,
+    ):
+        self.args = args
+        self.sheet_cache = sheet_cache
+        self.card_index = card_index
+        self.tile_cache = tile_cache
+        self.raw_sheet_store = raw_sheet_store
+
+        # Jobs may use another cache folder, which has an index of its own
+        self.cache_indexes = {}
+        if cache_index is not None:
+            self.cache_indexes[os.path.abspath(args.cachepath)] = cache_index
+        self.jobs = OrderedDict()
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=args.job_workers)
+
+    def job_args(self, options):
+        # Read the options of a job the same way as the command line, starting
+        # from the options the server was started with
+        argv = []
+        for name, value in options.items():
+            if name in SERVER_ONLY_OPTIONS:
+                raise ValueError(f"option {name} can't be set for a job")
+            flag = "--" + name.replace("_", "-")
+            if name in REPEATED_OPTIONS:
+                # Targets may be given as strings or as objects of settings
+                for item in value if isinstance(value, list) else [value]:
+                    if isinstance(item, dict):
+                        item = ",".join(f"{key}={item[key]}" for key in item)
+                    argv += [flag, str(item)]
+            elif value is True:
+                argv.append(flag)
+            elif value is False:
+                argv.append("--no-" + flag[2:])
+            elif isinstance(value, list):
+                argv += [flag] + [str(item) for item in value]
+            elif value is not None:
+                argv += [flag, str(value)]
+
+        parser = build_arg_parser()
+
+        def error(message):
+            raise ValueError(message)
+
+        parser.error = error
+        return parser.parse_args(argv, namespace=argparse.Namespace(**vars(self.args)))
+
+    def submit(self, request):
+        if not isinstance(request.get("options", {}), dict):
+            raise ValueError("the options must be a JSON object")
+        if ("save" in request) == ("filepath" in request):
+            raise ValueError("a job needs either a save or a filepath")
+        if "filepath" in request and not isinstance(request["filepath"], str):
+            raise ValueError("the filepath must be a string")
+        args = self.job_args(request.get("options", {}))
+
+        with self._lock:
+            job_id = str(next(self._ids))
+        os.makedirs(args.output_dir, exist_ok=True)
+        if "save" in request:
+            # Keep the uploaded save next to the PDF it is rendered into
+            args.filepath = os.path.join(args.output_dir, f"job{job_id}.json")
+        else:
+            args.filepath = request["filepath"]
+        if "output" not in request.get("options", {}):
+            deck_name = os.path.splitext(os.path.basename(args.filepath))[0]
+            if "filepath" in request:
+                deck_name += f"_{job_id}"
+            args.output = os.path.join(args.output_dir, deck_name + ".pdf")
+        resolve_targets(args)
+        if "save" in request:
+            with open(args.filepath, "w") as f:
+                json.dump(request["save"], f)
+
+        job = {"id": job_id, "status": "queued", "filepath": args.filepath}
+        with self._lock:
+            self.jobs[job_id] = job
+        self.executor.submit(self._run, job, args)
+        logging.info(f"Queued job {job_id} for {args.filepath}")
+        return dict(job)
+
+    def _cache_index(self, args):
+        if not args.cache_index:
+            return None
+        cache_folder = os.path.abspath(args.cachepath)
+        with self._lock:
+            if cache_folder not in self.cache_indexes:
+                self.cache_indexes[cache_folder] = create_cache_index(args)
+            return self.cache_indexes[cache_folder]
+
+    def _run(self, job, args):
+        job["status"] = "running"
+        try:
+            # Caches are only shared with jobs that use them
+            if args.card_quantity_source == "arkhamdb":
+                with self._lock:
+                    if self.card_index is None:
+                        self.card_index = CardIndex()
+            outputs = render_deck(
+                args,
+                self.sheet_cache,
+                self.card_index,
+                self.tile_cache if args.tile_cache else None,
+                self.raw_sheet_store if args.raw_sheet_store else None,
+                self._cache_index(args),
+            )
+        except Exception as e:
+            logging.exception(f"Job {job['id']} failed")
+            job.update(status="failed", error=str(e))
+            return
+
+        with open(manifest_path(outputs[0]), "r") as f:
+            image_ids = f.read().split("\n")[1:-1]
+        job.update(
+            status="done",
+            output=os.path.abspath(outputs[0]),
+            outputs=[os.path.abspath(output) for output in outputs],
+            manifest=os.path.abspath(manifest_path(outputs[0])),
+            image_ids=image_ids,
+        )
+        if args.report:
+            job["report"] = os.path.abspath(report_path(outputs[0]))
+        logging.info(f"Finished job {job['id']}: {', '.join(outputs)}")
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self):
+        with self._lock:
+            return [
+                {"id": job["id"], "status": job["status"]} for job in self.jobs.values()
+            ]
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    # POST /jobs queues a job, GET /jobs lists the jobs and GET /jobs/<id>
+    # returns the status of a job, with the PDF and manifest paths once it is done
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        jobs = self.server.render_jobs
+        if self.path.rstrip("/") == "/jobs":
+            self._send_json(200, jobs.list())
+            return
+        job = None
+        if self.path.startswith("/jobs/"):
+            job = jobs.get(self.path[len("/jobs/") :].rstrip("/"))
+        if job is None:
+            self._send_json(404, {"error": "no such job"})
+        else:
+            self._send_json(200, job)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "unknown path"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("the request must be a JSON object")
+            job = self.server.render_jobs.submit(request)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, job)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def serve(
+    args,
+    sheet_cache,
+    card_index=None,
+    tile_cache=None,
+    raw_sheet_store=None,
+    cache_index=None,
+):
+    server = ThreadingHTTPServer((args.host, args.port), RenderRequestHandler)
+    server.render_jobs = RenderJobs(
+        args, sheet_cache, card_index, tile_cache, raw_sheet_store, cache_index
+    )
+    logging.info(
+        f"Serving render jobs on http://{args.host}:{server.server_address[1]}/jobs "
+        f"with {args.job_workers} job workers"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.render_jobs.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def maintain_cache_index(args):
+    cache_index = CacheIndex(
+        os.path.normpath(args.cachepath) + CACHE_INDEX_SUFFIX,
+        args.cachepath,
+        args.cache_size,
+    )
+    if args.cache_maintenance == "rebuild":
+        cache_index.rebuild()
+    else:
+        cache_index.verify()
+    cache_index.evict()
+    cache_index.save()
+
+    total_bytes, owned_bytes = cache_index.size_stats()
+    logging.info(
+        f"Cache folder: {total_bytes // (1024 * 1024)} MB indexed, "
+        f"{owned_bytes // (1024 * 1024)} MB downloaded by this tool"
+    )
 
 
 def main():
-    # Parse the arguments
-    args = parse_args()
+    # Use the command line when arguments are given and the GUI otherwise
+    if len(sys.argv) > 1:
+        parser = build_arg_parser()
+        args = parser.parse_args()
+        if not args.filepaths and not (args.serve or args.cache_maintenance):
+            parser.error("at least one TTS file is required")
+        if len(args.filepaths) > 1 and args.output != OUTPUT_PDF_PATH:
+            parser.error("--output can only be used with a single file")
+        if args.cache_maintenance and not os.path.isdir(args.cachepath):
+            parser.error(f"the cache folder {args.cachepath} does not exist")
+        try:
+            resolve_targets(args)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        args = parse_args()
 
     # Configure logging
     if args.verbose:
         logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-    # Extract the images
-    logging.info("Extracting images...")
-    images = extract_images(args)
-    logging.info("Successfully extracted images")
-
-    # Write a csv containing the keys of the images dictionary
-    with open("tts_extract_out_manifest.csv", "w") as f:
-        f.write("image_id\n")
-        for key in images.keys():
-            f.write(f"{key}\n")
-
-    # Arrange the images into a single pdf
-    arrange_images(images, args)
+    if args.cache_maintenance:
+        maintain_cache_index(args)
+        return
+
+    # Share decoded sheets, the card index and card tiles between all the decks
+    sheet_cache = SheetCache(args.sheet_cache_size)
+    card_index = CardIndex() if args.card_quantity_source == "arkhamdb" else None
+    tile_cache = create_tile_cache(args)
+    raw_sheet_store = create_raw_sheet_store(args)
+    cache_index = create_cache_index(args)
+
+    if args.serve:
+        serve(args, sheet_cache, card_index, tile_cache, raw_sheet_store, cache_index)
+        return
+
+    for filepath in args.filepaths:
+        deck_args = argparse.Namespace(**vars(args))
+        deck_args.filepath = filepath
+        if len(args.filepaths) > 1:
+            os.makedirs(args.output_dir, exist_ok=True)
+            deck_name = os.path.splitext(os.path.basename(filepath))[0]
+            deck_args.output = os.path.join(args.output_dir, deck_name + ".pdf")
+        outputs = render_deck(
+            deck_args,
+            sheet_cache,
+            card_index,
+            tile_cache,
+            raw_sheet_store,
+            cache_index,
+        )
 
-    # Open the pdf file
-    webbrowser.open("tts_extract_out.pdf")
+        # Open the pdf file, or the first one when there are several targets
+        if args.open_pdf:
+            webbrowser.open(outputs[0])
 
 
 if __name__ == "__main__":